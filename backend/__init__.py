@@ -1,3 +1,7 @@
+import asyncio
+import contextlib
+import typing as t
+
 import sentry_sdk
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 from starlette.applications import Starlette
@@ -6,11 +10,11 @@ from starlette.middleware import Middleware
 from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
-from backend import constants
+from backend import constants, database, forms, http_clients, indexes
 from backend.authentication import JWTAuthenticationBackend
-from backend.middleware import DatabaseMiddleware, ProtectedDocsMiddleware
+from backend.middleware import ProtectedDocsMiddleware, RateLimitMiddleware, RoundTripMiddleware
+from backend.responses import JSONResponse
 from backend.route_manager import create_route_map
 from backend.validation import api
 
@@ -44,7 +48,8 @@ middleware = [
         allow_methods=["*"],
         allow_credentials=True,
     ),
-    Middleware(DatabaseMiddleware),
+    Middleware(RateLimitMiddleware),
+    Middleware(RoundTripMiddleware),
     Middleware(AuthenticationMiddleware, backend=JWTAuthenticationBackend()),
     Middleware(SentryAsgiMiddleware),
     Middleware(ProtectedDocsMiddleware),
@@ -57,7 +62,37 @@ async def http_exception(_request: Request, exc: HTTPException) -> JSONResponse:
 
 exception_handlers = {HTTPException: http_exception}
 
+
+@contextlib.asynccontextmanager
+async def lifespan(_app: Starlette) -> t.AsyncIterator[dict[str, t.Any]]:
+    """
+    Manage resources which live for the whole lifetime of the worker.
+
+    The yielded state is exposed on `request.state` for every request.
+    """
+    client = database.create_client()
+    db = client[constants.MONGO_DATABASE]
+    if constants.MONGO_APPLY_INDEXES:
+        await indexes.apply_indexes(db)
+
+    http_clients.open_clients()
+    watcher = None
+    if constants.FORM_CACHE_CHANGE_STREAM:
+        watcher = asyncio.create_task(forms.watch_changes(db))
+
+    try:
+        yield {"db": db}
+    finally:
+        if watcher:
+            watcher.cancel()
+        await http_clients.close_clients()
+        client.close()
+
+
 app = Starlette(
-    routes=create_route_map(), middleware=middleware, exception_handlers=exception_handlers
+    routes=create_route_map(),
+    middleware=middleware,
+    exception_handlers=exception_handlers,
+    lifespan=lifespan,
 )
 api.register(app)
@@ -1,4 +1,4 @@
-from .backend import JWTAuthenticationBackend
+from .backend import JWTAuthenticationBackend, invalidate_all, invalidate_user
 from .user import User
 
-__all__ = ["JWTAuthenticationBackend", "User"]
+__all__ = ["JWTAuthenticationBackend", "User", "invalidate_all", "invalidate_user"]
@@ -1,13 +1,44 @@
+import hashlib
+import typing as t
+
 import jwt
 from starlette import authentication
 from starlette.requests import Request
 
-from backend import constants, discord
+from backend import constants, discord, models
+from backend.cache import LRUCache
 
 # We must import user such way here to avoid circular imports
 from .user import User
 
 
+class _ResolvedUser(t.NamedTuple):
+    """The parts of an authenticated user which are looked up from Discord, Redis and MongoDB."""
+
+    user_id: str
+    member: models.DiscordMember | None
+    admin: bool
+    scopes: tuple[str, ...]
+
+
+# Keyed by a hash of the JWT
+_cache: LRUCache[str, _ResolvedUser] = LRUCache(
+    "auth",
+    maxsize=constants.AUTH_CACHE_SIZE,
+    ttl=constants.AUTH_CACHE_TTL,
+)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop the cached authentication results of a user, after their roles or admin status change."""
+    _cache.remove_where(lambda _, resolved: resolved.user_id == user_id)
+
+
+def invalidate_all() -> None:
+    """Drop all cached authentication results, after the guild roles change."""
+    _cache.clear()
+
+
 class JWTAuthenticationBackend(authentication.AuthenticationBackend):
     """Custom Starlette authentication backend for JWT."""
 
@@ -30,7 +61,12 @@ class JWTAuthenticationBackend(authentication.AuthenticationBackend):
         self,
         request: Request,
     ) -> tuple[authentication.AuthCredentials, authentication.BaseUser] | None:
-        """Handles JWT authentication process."""
+        """
+        Handles JWT authentication process.
+
+        The token is always decoded and checked, but the member, admin status and roles
+        are cached for a short time to avoid looking them up on every request.
+        """
         cookie = request.cookies.get("token")
         if not cookie:
             return None
@@ -42,8 +78,6 @@ class JWTAuthenticationBackend(authentication.AuthenticationBackend):
         except jwt.InvalidTokenError as e:
             raise authentication.AuthenticationError(str(e))
 
-        scopes = ["authenticated"]
-
         if not payload.get("token"):
             msg = "Token is missing from JWT."
             raise authentication.AuthenticationError(msg)
@@ -60,14 +94,27 @@ class JWTAuthenticationBackend(authentication.AuthenticationBackend):
             msg = "Could not parse user details."
             raise authentication.AuthenticationError(msg)
 
-        user = User(
-            token,
-            user_details,
-            await discord.get_member(user_details["id"]),
-        )
-        if await user.fetch_admin_status(request.state.db):
-            scopes.append("admin")
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        resolved = _cache.get(token_hash)
+
+        if resolved is None:
+            scopes = ["authenticated"]
+
+            user = User(
+                token,
+                user_details,
+                await discord.get_member(user_details["id"]),
+            )
+            if await user.fetch_admin_status(request.state.db):
+                scopes.append("admin")
+
+            scopes.extend(await user.get_user_roles())
+
+            resolved = _ResolvedUser(user.user_id, user.member, user.admin, tuple(scopes))
+            _cache.set(token_hash, resolved)
 
-        scopes.extend(await user.get_user_roles())
+        # The payload is decoded per request, so handlers are free to modify the user
+        user = User(token, user_details, resolved.member)
+        user.admin = resolved.admin
 
-        return authentication.AuthCredentials(scopes), user
+        return authentication.AuthCredentials(list(resolved.scopes)), user
@@ -49,8 +49,8 @@ class User(BaseUser):
         if not self.member:
             return []
 
-        server_roles = await discord.get_roles()
-        roles = [role.name for role in server_roles if role.id in self.member.roles]
+        role_names = (await discord.get_role_index()).names
+        roles = [role_names[role_id] for role_id in self.member.roles if role_id in role_names]
 
         if "admin" in roles:
             # Protect against collision with the forms admin role
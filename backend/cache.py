@@ -0,0 +1,271 @@
+"""Caches held in each worker, and shared between workers through Redis."""
+
+import asyncio
+import collections
+import hashlib
+import logging
+import math
+import random
+import time
+import typing as t
+
+from backend import constants, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache[K, V]:
+    """
+    A size bounded cache where entries also expire after a fixed time.
+
+    When full, the least recently used entry is evicted. Hits and misses are counted
+    in the metrics under `cache.<name>.hit` and `cache.<name>.miss`.
+    """
+
+    def __init__(self, name: str, *, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: collections.OrderedDict[K, tuple[float, V]] = collections.OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        """Get the value stored under `key`, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            metrics.increment(f"cache.{self.name}.miss")
+            return None
+
+        self._entries.move_to_end(key)
+        metrics.increment(f"cache.{self.name}.hit")
+        return entry[1]
+
+    def peek(self, key: K) -> V | None:
+        """Get the value stored under `key` like `get`, without counting it as a use."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        """Store `value` under `key`, evicting the least recently used entry if needed."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        """Remove `key` from the cache, if present."""
+        self._entries.pop(key, None)
+
+    def remove_where(self, predicate: t.Callable[[K, V], bool]) -> None:
+        """Remove every entry for which `predicate(key, value)` is true."""
+        for key in [key for key, (_, value) in self._entries.items() if predicate(key, value)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _TieredEntry[V](t.NamedTuple):
+    value: V
+    # A hash of the serialized value, which only changes when the value does
+    version: str
+    # How long the value took to load, in seconds
+    delta: float
+    # When the shared entry expires, as a UNIX timestamp
+    expires: float
+    # When the entry was last checked against the shared entry, in monotonic time
+    checked: float
+
+
+class TieredCache[V]:
+    """
+    A cache of values loaded from a slow upstream, such as the Discord API.
+
+    Values are kept in an `LRUCache` in each worker, backed by Redis which is shared by all
+    workers. On a miss in both, the value is loaded with `loader`, and concurrent misses for the
+    same key in a worker wait for that single load, rather than each calling the upstream.
+
+    Values are stored with a hash of their serialized form as their version. Every
+    `recheck_interval` seconds a worker compares the version of its entry with the one in Redis,
+    and keeps its value, as the same object, unless the version changed. Callers can therefore
+    keep anything derived from a value for as long as they get the same object back.
+
+    To avoid every worker reloading a popular key the moment it expires, entries are refreshed
+    in the background before they expire, with a probability which rises as expiry nears and
+    with how long the value took to load. This is the XFetch algorithm, `beta` above 1 makes
+    refreshes earlier.
+
+    None is never cached, so values which don't exist are loaded every time.
+    Besides the counts of the local cache, hits and misses in Redis, rechecks which found the
+    value unchanged, loads, loads shared by concurrent misses and early refreshes are counted
+    in the metrics under `cache.<name>.`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        loader: t.Callable[[str], t.Awaitable[V | None]],
+        dump: t.Callable[[V], bytes],
+        load: t.Callable[[bytes], V],
+        ttl: float,
+        recheck_interval: float,
+        local_maxsize: int,
+        beta: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.recheck_interval = recheck_interval
+        self.beta = beta
+        self._loader = loader
+        self._dump = dump
+        self._load = load
+        self._local: LRUCache[str, _TieredEntry[V]] = LRUCache(
+            f"{name}.local",
+            maxsize=local_maxsize,
+            ttl=ttl,
+        )
+        self._loading: dict[str, asyncio.Task[V | None]] = {}
+        self._refreshes: set[asyncio.Task[V | None]] = set()
+
+    def _redis_key(self, key: str) -> str:
+        return f"forms-backend:{self.name}_cache:{key}"
+
+    async def get(self, key: str, *, force_refresh: bool = False) -> V | None:
+        """
+        Get the value of `key`, loading it if it isn't cached.
+
+        If `force_refresh` is True, the cache is skipped and the entry is updated.
+        """
+        if force_refresh:
+            return await self._load_and_store(key)
+
+        entry = self._local.get(key)
+        if entry is None:
+            entry = await self._get_shared(key)
+        elif time.monotonic() >= entry.checked + self.recheck_interval:
+            entry = await self._recheck(key, entry)
+
+        if entry is None:
+            return await asyncio.shield(self._start_load(key))
+
+        if self._should_refresh(entry):
+            metrics.increment(f"cache.{self.name}.early_refresh")
+            self._refresh_in_background(key)
+
+        return entry.value
+
+    async def _recheck(self, key: str, entry: _TieredEntry[V]) -> _TieredEntry[V] | None:
+        """Check a local entry is still current, only reading the shared value if it changed."""
+        version = await constants.REDIS_CLIENT.hget(self._redis_key(key), "version")
+        if version is None or version.decode() != entry.version:
+            return await self._get_shared(key)
+
+        metrics.increment(f"cache.{self.name}.unchanged")
+        entry = entry._replace(checked=time.monotonic())
+        self._local.set(key, entry)
+        return entry
+
+    async def _get_shared(self, key: str) -> _TieredEntry[V] | None:
+        data = await constants.REDIS_CLIENT.hgetall(self._redis_key(key))
+        if not data:
+            metrics.increment(f"cache.{self.name}.shared.miss")
+            self._local.pop(key)
+            return None
+
+        metrics.increment(f"cache.{self.name}.shared.hit")
+        return self._store_local(
+            key,
+            lambda: self._load(data[b"value"]),
+            version=data[b"version"].decode(),
+            delta=float(data[b"delta"]),
+            expires=float(data[b"expires"]),
+        )
+
+    def _store_local(
+        self,
+        key: str,
+        value: t.Callable[[], V],
+        *,
+        version: str,
+        delta: float,
+        expires: float,
+    ) -> _TieredEntry[V]:
+        """Store an entry in the local cache, keeping the current value if it's the same version."""
+        previous = self._local.peek(key)
+        if previous is not None and previous.version == version:
+            kept = previous.value
+        else:
+            kept = value()
+
+        entry = _TieredEntry(kept, version, delta, expires, time.monotonic())
+        self._local.set(key, entry)
+        return entry
+
+    def _should_refresh(self, entry: _TieredEntry[V]) -> bool:
+        # `1 - random()` is never 0, which has no logarithm
+        early = -entry.delta * self.beta * math.log(1 - random.random())
+        return time.time() + early >= entry.expires
+
+    def _start_load(self, key: str) -> asyncio.Task[V | None]:
+        """Load a key, or join the load of it which is already running."""
+        if (task := self._loading.get(key)) is not None:
+            metrics.increment(f"cache.{self.name}.coalesced")
+            return task
+
+        task = asyncio.create_task(self._load_and_store(key))
+        self._loading[key] = task
+        task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return task
+
+    def _refresh_in_background(self, key: str) -> None:
+        task = self._start_load(key)
+        if task in self._refreshes:
+            return
+
+        self._refreshes.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task[V | None]) -> None:
+        self._refreshes.discard(task)
+        # The cached value is still served, so a failed refresh is only logged
+        if not task.cancelled() and (error := task.exception()):
+            logger.warning("Early refresh of the %s cache failed", self.name, exc_info=error)
+
+    async def _load_and_store(self, key: str) -> V | None:
+        metrics.increment(f"cache.{self.name}.load")
+
+        started = time.monotonic()
+        value = await self._loader(key)
+        if value is None:
+            return None
+
+        body = self._dump(value)
+        version = hashlib.blake2b(body, digest_size=16).hexdigest()
+        delta = time.monotonic() - started
+        expires = time.time() + self.ttl
+
+        async with constants.REDIS_CLIENT.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                self._redis_key(key),
+                mapping={
+                    "value": body,
+                    "version": version,
+                    "delta": delta,
+                    "expires": expires,
+                },
+            )
+            pipe.expire(self._redis_key(key), math.ceil(self.ttl))
+            await pipe.execute()
+
+        entry = self._store_local(key, lambda: value, version=version, delta=delta, expires=expires)
+        return entry.value
@@ -0,0 +1,115 @@
+"""
+Verification of hCaptcha tokens, with the results cached in Redis.
+
+Submissions which fail a later check, such as missing fields or failing unittests, are often
+retried with the same token. hCaptcha only accepts a token once, so the result of the first
+verification is kept for `CAPTCHA_CACHE_TTL` seconds and reused by the retries. Once a
+submission is stored, its token is marked as spent, and any other submission with it
+is rejected as a replay.
+"""
+
+import asyncio
+import hashlib
+
+from backend import constants, metrics
+from backend.http_clients import Upstream, get_client
+
+HCAPTCHA_VERIFY_URL = "https://hcaptcha.com/siteverify"
+HCAPTCHA_HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded",
+}
+
+_PREFIX = "forms-backend:captcha"
+_PASSED, _FAILED, _SPENT = b"passed", b"failed", b"spent"
+
+# Verifications still waiting on hCaptcha, which may outlive the submission that started them
+_verifications: dict[str, asyncio.Task[bool]] = {}
+
+
+class CaptchaReplayedError(Exception):
+    """The token was already used by a stored submission."""
+
+
+def _key(token: str) -> str:
+    # Tokens are only stored hashed, so they can't be read back from Redis
+    return f"{_PREFIX}:{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+async def _siteverify(token: str | None) -> bool:
+    query_params = {
+        "secret": constants.HCAPTCHA_API_SECRET,
+        "response": token,
+    }
+    r = await get_client(Upstream.HCAPTCHA).post(
+        HCAPTCHA_VERIFY_URL,
+        params=query_params,
+        headers=HCAPTCHA_HEADERS,
+    )
+    r.raise_for_status()
+    return r.json()["success"]
+
+
+async def verify(token: str | None) -> bool:
+    """
+    Check whether hCaptcha accepts a token, reusing an earlier result for the same token.
+
+    Raises `CaptchaReplayedError` if the token was spent by another submission.
+    """
+    if token is None:
+        return await _siteverify(token)
+
+    key = _key(token)
+    cached = await constants.REDIS_CLIENT.get(key)
+
+    if cached == _SPENT:
+        metrics.increment("captcha.replay")
+        raise CaptchaReplayedError
+    if cached is not None:
+        metrics.increment("cache.captcha.hit")
+        return cached == _PASSED
+
+    metrics.increment("cache.captcha.miss")
+
+    # Once hCaptcha has seen the token, it won't accept it again. So the result is still cached
+    # if the submission stops waiting for it, such as when another of its checks fails.
+    # A retry sent before the result is known joins the verification.
+    if (task := _verifications.get(key)) is None:
+        task = asyncio.create_task(_verify_and_cache(key, token))
+        _verifications[key] = task
+        task.add_done_callback(lambda _: _verifications.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _verify_and_cache(key: str, token: str) -> bool:
+    passed = await _siteverify(token)
+
+    # Don't overwrite the mark of a submission which spent the token in the meantime
+    await constants.REDIS_CLIENT.set(
+        key,
+        _PASSED if passed else _FAILED,
+        ex=constants.CAPTCHA_CACHE_TTL,
+        nx=True,
+    )
+    return passed
+
+
+async def spend(token: str | None) -> bool:
+    """
+    Mark a token as used by a stored submission.
+
+    Returns False if it was already spent, in which case the submission is a replay.
+    """
+    if token is None:
+        return True
+
+    previous = await constants.REDIS_CLIENT.set(
+        _key(token),
+        _SPENT,
+        ex=constants.CAPTCHA_CACHE_TTL,
+        get=True,
+    )
+    if previous == _SPENT:
+        metrics.increment("captcha.replay")
+        return False
+
+    return True
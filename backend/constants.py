@@ -11,7 +11,64 @@ load_dotenv()
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://forms.pythondiscord.com")
 DATABASE_URL = os.getenv("DATABASE_URL")
 MONGO_DATABASE = os.getenv("MONGO_DATABASE", "pydis_forms")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_APPLY_INDEXES = os.getenv("MONGO_APPLY_INDEXES", "True").lower() != "false"
 SNEKBOX_URL = os.getenv("SNEKBOX_URL", "http://snekbox.default.svc.cluster.local/eval")
+# Evaluations running at once across all replicas, and in each replica
+SNEKBOX_MAX_CONCURRENCY = int(os.getenv("SNEKBOX_MAX_CONCURRENCY", "8"))
+SNEKBOX_PROCESS_CONCURRENCY = int(os.getenv("SNEKBOX_PROCESS_CONCURRENCY", "4"))
+# Seconds an evaluation waits for a slot before it's reported as an error
+SNEKBOX_ACQUIRE_TIMEOUT = float(os.getenv("SNEKBOX_ACQUIRE_TIMEOUT", "30"))
+# Part of the unittest result cache key, change it when snekbox is upgraded
+SNEKBOX_VERSION = os.getenv("SNEKBOX_VERSION", "1")
+UNITTEST_CACHE_TTL = int(os.getenv("UNITTEST_CACHE_TTL", str(60 * 60 * 6)))
+
+FORM_CACHE_SIZE = int(os.getenv("FORM_CACHE_SIZE", "256"))
+FORM_CACHE_TTL = float(os.getenv("FORM_CACHE_TTL", "30"))
+FORM_CACHE_CHANGE_STREAM = os.getenv("FORM_CACHE_CHANGE_STREAM", "False").lower() == "true"
+FORM_CACHE_CHANGE_STREAM_RETRY = float(os.getenv("FORM_CACHE_CHANGE_STREAM_RETRY", "5"))
+PUBLIC_FORM_CACHE_TTL = float(os.getenv("PUBLIC_FORM_CACHE_TTL", "600"))
+
+# How long shared caches may serve public forms without revalidating them
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "60"))
+
+# Summaries are invalidated as responses change, so this only bounds memory use
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(60 * 60)))
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+
+# Discord members and roles are shared between workers through Redis, and kept in each worker.
+# Workers check their copy is current at the recheck interval, which bounds how long they may
+# disagree after a forced refresh
+MEMBER_CACHE_TTL = int(os.getenv("MEMBER_CACHE_TTL", str(60 * 60)))
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "1024"))
+MEMBER_CACHE_RECHECK_INTERVAL = float(os.getenv("MEMBER_CACHE_RECHECK_INTERVAL", "30"))
+ROLE_CACHE_TTL = int(os.getenv("ROLE_CACHE_TTL", str(60 * 60 * 24)))
+ROLE_INDEX_RECHECK_INTERVAL = float(os.getenv("ROLE_INDEX_RECHECK_INTERVAL", "5"))
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# See backend/rate_limits.py
+SUBMIT_RATE_LIMIT = os.getenv("SUBMIT_RATE_LIMIT", "10/60")
+SUBMIT_FORM_RATE_LIMITS = os.getenv("SUBMIT_FORM_RATE_LIMITS", "")
+
+# See backend/jobs.py
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "10"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "60"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_DONE_RETENTION = int(os.getenv("JOB_DONE_RETENTION", str(60 * 60 * 24)))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "8"))
+JOB_BASE_BACKOFF = float(os.getenv("JOB_BASE_BACKOFF", "2"))
+JOB_MAX_BACKOFF = float(os.getenv("JOB_MAX_BACKOFF", "600"))
 
 REDIS_CLIENT = _Redis.from_url(os.getenv("REDIS_URL"), encoding="utf-8")
 
@@ -35,6 +92,8 @@ DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 DISCORD_GUILD = os.getenv("DISCORD_GUILD", "267624335836053506")
 
 HCAPTCHA_API_SECRET = os.getenv("HCAPTCHA_API_SECRET")
+# hCaptcha tokens expire two minutes after they are issued
+CAPTCHA_CACHE_TTL = int(os.getenv("CAPTCHA_CACHE_TTL", "120"))
 
 QUESTION_TYPES = [
     "radio",
@@ -71,6 +130,8 @@ REQUIRED_QUESTION_TYPE_DATA = {
 }
 
 DISCORD_API_BASE_URL = "https://discord.com/api/v8"
+# Discord allows 50 requests per second for a bot, across all replicas
+DISCORD_GLOBAL_RATE_LIMIT = int(os.getenv("DISCORD_GLOBAL_RATE_LIMIT", "45"))
 
 
 class FormFeatures(Enum):
@@ -0,0 +1,69 @@
+"""Management of the process-wide MongoDB client."""
+
+import contextlib
+import contextvars
+import typing as t
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from backend import constants
+
+
+class RoundTrips:
+    """The number of commands sent to MongoDB while handling a request."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+
+_round_trips: contextvars.ContextVar[RoundTrips | None] = contextvars.ContextVar(
+    "mongo_round_trips",
+    default=None,
+)
+
+
+class _RoundTripListener(monitoring.CommandListener):
+    """Count every command against the request that issued it."""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:  # noqa: ARG002
+        # Motor copies the calling context into its executor, so this is the request's counter
+        if (round_trips := _round_trips.get()) is not None:
+            round_trips.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def count_round_trips() -> t.Iterator[RoundTrips]:
+    """Count the MongoDB round-trips made within the context."""
+    round_trips = RoundTrips()
+    token = _round_trips.set(round_trips)
+    try:
+        yield round_trips
+    finally:
+        _round_trips.reset(token)
+
+
+def create_client() -> AsyncIOMotorClient:
+    """
+    Create the MongoDB client shared by every request handled by this worker.
+
+    The client owns a connection pool, so it must be created once and reused rather than
+    constructed per request. It should be closed when the worker shuts down.
+    """
+    return AsyncIOMotorClient(
+        constants.DATABASE_URL,
+        tlsAllowInvalidCertificates=True,
+        maxPoolSize=constants.MONGO_MAX_POOL_SIZE,
+        minPoolSize=constants.MONGO_MIN_POOL_SIZE,
+        connectTimeoutMS=constants.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=constants.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=constants.MONGO_SOCKET_TIMEOUT_MS,
+        readPreference=constants.MONGO_READ_PREFERENCE,
+        event_listeners=[_RoundTripListener()],
+    )
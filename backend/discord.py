@@ -1,66 +1,107 @@
 """Various utilities for working with the Discord API."""
 
+import hashlib
 import json
+import typing as t
 
-import httpx
 import starlette.requests
 from starlette import exceptions
 
-from backend import constants, models
+from backend import constants, discord_ratelimit, forms, models, responses
+from backend.cache import TieredCache
 
 
 async def fetch_bearer_token(code: str, redirect: str, *, refresh: bool) -> dict:
-    async with httpx.AsyncClient() as client:
-        data = {
-            "client_id": constants.OAUTH2_CLIENT_ID,
-            "client_secret": constants.OAUTH2_CLIENT_SECRET,
-            "redirect_uri": f"{redirect}/callback",
-        }
-
-        if refresh:
-            data["grant_type"] = "refresh_token"
-            data["refresh_token"] = code
-        else:
-            data["grant_type"] = "authorization_code"
-            data["code"] = code
-
-        r = await client.post(
-            f"{constants.DISCORD_API_BASE_URL}/oauth2/token",
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded",
-            },
-            data=data,
-        )
-
-        r.raise_for_status()
-
-        return r.json()
+    data = {
+        "client_id": constants.OAUTH2_CLIENT_ID,
+        "client_secret": constants.OAUTH2_CLIENT_SECRET,
+        "redirect_uri": f"{redirect}/callback",
+    }
+
+    if refresh:
+        data["grant_type"] = "refresh_token"
+        data["refresh_token"] = code
+    else:
+        data["grant_type"] = "authorization_code"
+        data["code"] = code
+
+    r = await discord_ratelimit.request(
+        "POST",
+        f"{constants.DISCORD_API_BASE_URL}/oauth2/token",
+        route="/oauth2/token",
+        use_global=False,
+        headers={
+            "Content-Type": "application/x-www-form-urlencoded",
+        },
+        data=data,
+    )
+
+    r.raise_for_status()
+
+    return r.json()
 
 
 async def fetch_user_details(bearer_token: str) -> dict:
-    async with httpx.AsyncClient() as client:
-        r = await client.get(
-            f"{constants.DISCORD_API_BASE_URL}/users/@me",
-            headers={
-                "Authorization": f"Bearer {bearer_token}",
-            },
-        )
+    r = await discord_ratelimit.request(
+        "GET",
+        f"{constants.DISCORD_API_BASE_URL}/users/@me",
+        route="/users/@me",
+        # Limited per user, rather than for the bot
+        major=hashlib.sha256(bearer_token.encode()).hexdigest(),
+        use_global=False,
+        headers={
+            "Authorization": f"Bearer {bearer_token}",
+        },
+    )
 
-        r.raise_for_status()
+    r.raise_for_status()
 
-        return r.json()
+    return r.json()
 
 
 async def _get_role_info() -> list[models.DiscordRole]:
     """Get information about the roles in the configured guild."""
-    async with httpx.AsyncClient() as client:
-        r = await client.get(
-            f"{constants.DISCORD_API_BASE_URL}/guilds/{constants.DISCORD_GUILD}/roles",
-            headers={"Authorization": f"Bot {constants.DISCORD_BOT_TOKEN}"},
-        )
+    r = await discord_ratelimit.request(
+        "GET",
+        f"{constants.DISCORD_API_BASE_URL}/guilds/{constants.DISCORD_GUILD}/roles",
+        route="/guilds/{guild_id}/roles",
+        major=constants.DISCORD_GUILD,
+        headers={"Authorization": f"Bot {constants.DISCORD_BOT_TOKEN}"},
+    )
+
+    r.raise_for_status()
+    return [models.DiscordRole(**role) for role in r.json()]
+
+
+def _load_roles(data: bytes) -> list[models.DiscordRole]:
+    return [models.DiscordRole(**role) for role in json.loads(data)]
+
+
+_role_cache: TieredCache[list[models.DiscordRole]] = TieredCache(
+    "discord_roles",
+    loader=lambda _: _get_role_info(),
+    dump=responses.dumps,
+    load=_load_roles,
+    ttl=constants.ROLE_CACHE_TTL,
+    recheck_interval=constants.ROLE_INDEX_RECHECK_INTERVAL,
+    local_maxsize=1,
+)
+
+
+class RoleIndex(t.NamedTuple):
+    """Lookups between the IDs and names of the roles in the configured guild."""
+
+    roles: list[models.DiscordRole]
+    names: dict[str, str]
+    ids: dict[str, str]
+
+
+class _RoleIndexCache:
+    def __init__(self) -> None:
+        self.index: RoleIndex | None = None
+
 
-        r.raise_for_status()
-        return [models.DiscordRole(**role) for role in r.json()]
+_role_index = _RoleIndexCache()
 
 
 async def get_roles(
@@ -72,34 +113,54 @@ async def get_roles(
 
     If `force_refresh` is True, the cache is skipped and the roles are updated.
     """
-    role_cache_key = "forms-backend:role_cache"
-    if not force_refresh:
-        roles = await constants.REDIS_CLIENT.hgetall(role_cache_key)
-        if roles:
-            return [
-                models.DiscordRole(**json.loads(role_data)) for role_id, role_data in roles.items()
-            ]
+    return await _role_cache.get(constants.DISCORD_GUILD, force_refresh=force_refresh)
 
-    roles = await _get_role_info()
-    await constants.REDIS_CLIENT.hmset(role_cache_key, {role.id: role.json() for role in roles})
-    await constants.REDIS_CLIENT.expire(role_cache_key, 60 * 60 * 24)  # 1 day
-    return roles
+
+async def get_role_index() -> RoleIndex:
+    """
+    Get an index of the roles in the configured guild.
+
+    The index is kept in memory, and only rebuilt when the version of the cached roles
+    changes, as the role cache returns the same list until then. The version is checked at
+    most once every `ROLE_INDEX_RECHECK_INTERVAL` seconds.
+    """
+    roles = await get_roles()
+    if _role_index.index is None or _role_index.index.roles is not roles:
+        _role_index.index = RoleIndex(
+            roles=roles,
+            names={role.id: role.name for role in roles},
+            ids={role.name: role.id for role in roles},
+        )
+
+    return _role_index.index
 
 
 async def _fetch_member_api(member_id: str) -> models.DiscordMember | None:
     """Get a member by ID from the configured guild using the discord API."""
-    async with httpx.AsyncClient() as client:
-        r = await client.get(
-            f"{constants.DISCORD_API_BASE_URL}/guilds/{constants.DISCORD_GUILD}"
-            f"/members/{member_id}",
-            headers={"Authorization": f"Bot {constants.DISCORD_BOT_TOKEN}"},
-        )
+    r = await discord_ratelimit.request(
+        "GET",
+        f"{constants.DISCORD_API_BASE_URL}/guilds/{constants.DISCORD_GUILD}/members/{member_id}",
+        route="/guilds/{guild_id}/members/{user_id}",
+        major=constants.DISCORD_GUILD,
+        headers={"Authorization": f"Bot {constants.DISCORD_BOT_TOKEN}"},
+    )
+
+    if r.status_code == 404:
+        return None
 
-        if r.status_code == 404:
-            return None
+    r.raise_for_status()
+    return models.DiscordMember(**r.json())
 
-        r.raise_for_status()
-        return models.DiscordMember(**r.json())
+
+_member_cache: TieredCache[models.DiscordMember] = TieredCache(
+    "discord_member",
+    loader=_fetch_member_api,
+    dump=responses.dumps,
+    load=lambda data: models.DiscordMember(**json.loads(data)),
+    ttl=constants.MEMBER_CACHE_TTL,
+    recheck_interval=constants.MEMBER_CACHE_RECHECK_INTERVAL,
+    local_maxsize=constants.MEMBER_CACHE_SIZE,
+)
 
 
 async def get_member(
@@ -113,18 +174,26 @@ async def get_member(
     If `force_refresh` is True, the cache is skipped and the entry is updated.
     None may be returned if the member object does not exist.
     """
-    member_key = f"forms-backend:member_cache:{user_id}"
+    return await _member_cache.get(user_id, force_refresh=force_refresh)
+
 
-    if not force_refresh:
-        result = await constants.REDIS_CLIENT.get(member_key)
-        if result:
-            return models.DiscordMember(**json.loads(result))
+async def assign_role(member_id: str, role_id: str) -> None:
+    """
+    Give a role to a member of the configured guild.
 
-    member = await _fetch_member_api(user_id)
-    if member:
-        await constants.REDIS_CLIENT.set(member_key, member.json(), ex=60 * 60)
+    Raises `RateLimitedError` if a rate limit doesn't reset soon, rather than waiting for it.
+    """
+    r = await discord_ratelimit.request(
+        "PUT",
+        f"{constants.DISCORD_API_BASE_URL}/guilds/{constants.DISCORD_GUILD}"
+        f"/members/{member_id}/roles/{role_id}",
+        route="/guilds/{guild_id}/members/{user_id}/roles/{role_id}",
+        major=constants.DISCORD_GUILD,
+        max_wait=5,
+        headers={"Authorization": f"Bot {constants.DISCORD_BOT_TOKEN}"},
+    )
 
-    return member
+    r.raise_for_status()
 
 
 class FormNotFoundError(exceptions.HTTPException):
@@ -139,36 +208,39 @@ async def _verify_access_helper(
     form_id: str,
     request: starlette.requests.Request,
     attribute: str,
-) -> None:
-    """A low level helper to validate access to a form resource based on the user's scopes."""
-    form = await request.state.db.forms.find_one({"_id": form_id})
+) -> models.Form:
+    """
+    A low level helper to validate access to a form resource based on the user's scopes.
+
+    The form is returned, so handlers don't need to fetch it again.
+    """
+    form = await forms.get_form(request, form_id)
 
     if not form:
         raise FormNotFoundError(status_code=404)
 
     # Short circuit all resources for forms admins
     if "admin" in request.auth.scopes:
-        return
+        return form
 
-    form = models.Form(**form)
-    role_id_lookup = {role.id: role for role in await get_roles()}
+    role_names = (await get_role_index()).names
 
     for role_name_or_id in getattr(form, attribute, None) or []:
         if role_name_or_id in request.auth.scopes:
-            return
+            return form
 
-        role = role_id_lookup.get(role_name_or_id)
-        if role and role.name in request.auth.scopes:
-            return
+        role_name = role_names.get(role_name_or_id)
+        if role_name and role_name in request.auth.scopes:
+            return form
 
     raise UnauthorizedError(status_code=401)
 
 
-async def verify_response_access(form_id: str, request: starlette.requests.Request) -> None:
+async def verify_response_access(form_id: str, request: starlette.requests.Request) -> models.Form:
     """Ensure the user can access responses on the requested resource."""
-    await _verify_access_helper(form_id, request, "response_readers")
+    return await _verify_access_helper(form_id, request, "response_readers")
 
 
-async def verify_edit_access(form_id: str, request: starlette.requests.Request) -> None:
+async def verify_edit_access(form_id: str, request: starlette.requests.Request) -> models.Form:
     """Ensure the user can view and modify the requested resource."""
-    await _verify_access_helper(form_id, request, "editors")
+    return await _verify_access_helper(form_id, request, "editors")
@@ -0,0 +1,218 @@
+"""
+Discord rate limits, tracked in Redis so every replica and job worker shares them.
+
+Discord groups routes into buckets, named by the `X-RateLimit-Bucket` header, which are further
+split by the route's major parameter (the guild, channel or webhook). The remaining requests of
+each bucket are recorded from the response headers, and requests wait for the bucket to reset
+once it runs out, instead of being sent and rejected with a 429.
+
+Requests made with the bot token also count towards the global limit of the bot, which is
+tracked per second. A global 429 blocks all such requests until it expires.
+
+See https://discord.com/developers/docs/topics/rate-limits
+"""
+
+import asyncio
+import typing as t
+
+import httpx
+
+from backend import constants, metrics
+from backend.http_clients import Upstream, get_client
+
+_PREFIX = "forms-backend:discord_ratelimit"
+_GLOBAL_BLOCK_KEY = f"{_PREFIX}:global_block"
+
+# Returns how long to wait before the request may be sent, taking a slot if it may be sent now
+_ACQUIRE_SCRIPT = """
+local route, global_block = KEYS[1], KEYS[2]
+local prefix, major, use_global, global_limit = ARGV[1], ARGV[2], ARGV[3] == "1", tonumber(ARGV[4])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket_key = nil
+local bucket = redis.call("GET", route)
+if bucket then
+    bucket_key = prefix .. ":bucket:" .. bucket .. ":" .. major
+    local state = redis.call("HMGET", bucket_key, "remaining", "reset_at")
+    local remaining, reset_at = tonumber(state[1]), tonumber(state[2])
+    if remaining and reset_at and remaining <= 0 and reset_at > now then
+        return tostring(reset_at - now)
+    end
+end
+
+local second_key = nil
+if use_global then
+    local blocked_until = tonumber(redis.call("GET", global_block))
+    if blocked_until and blocked_until > now then
+        return tostring(blocked_until - now)
+    end
+
+    local second = math.floor(now)
+    second_key = prefix .. ":global:" .. second
+    if tonumber(redis.call("GET", second_key) or "0") >= global_limit then
+        return tostring(second + 1 - now)
+    end
+end
+
+if bucket_key and redis.call("EXISTS", bucket_key) == 1 then
+    redis.call("HINCRBY", bucket_key, "remaining", -1)
+end
+if second_key then
+    redis.call("INCR", second_key)
+    redis.call("EXPIRE", second_key, 2)
+end
+return "0"
+"""
+
+# Records the state of a bucket from the headers of a response
+_UPDATE_SCRIPT = """
+local route = KEYS[1]
+local prefix, major, bucket = ARGV[1], ARGV[2], ARGV[3]
+local remaining, reset_after = tonumber(ARGV[4]), tonumber(ARGV[5])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+redis.call("SET", route, bucket, "EX", 60 * 60 * 24)
+
+local bucket_key = prefix .. ":bucket:" .. bucket .. ":" .. major
+local reset_at = now + reset_after
+local known = redis.call("HMGET", bucket_key, "remaining", "reset_at")
+
+-- Responses to concurrent requests arrive out of order, so within the same window
+-- the lowest count is the most recent
+if known[1] and math.abs(tonumber(known[2]) - reset_at) < 1 then
+    remaining = math.min(remaining, tonumber(known[1]))
+end
+
+redis.call("HSET", bucket_key, "remaining", remaining, "reset_at", reset_at)
+redis.call("EXPIRE", bucket_key, math.ceil(reset_after) + 1)
+"""
+
+_acquire = constants.REDIS_CLIENT.register_script(_ACQUIRE_SCRIPT)
+_update = constants.REDIS_CLIENT.register_script(_UPDATE_SCRIPT)
+
+
+class RateLimitedError(Exception):
+    """A request to Discord would have to wait longer than allowed for a rate limit."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Rate limited, retry after {retry_after:.2f} seconds.")
+        self.retry_after = retry_after
+
+
+def _route_key(method: str, route: str) -> str:
+    return f"{_PREFIX}:route:{method} {route}"
+
+
+async def _wait(delay: float, deadline: float) -> None:
+    """Sleep for `delay` seconds, unless that would go past the deadline."""
+    if asyncio.get_running_loop().time() + delay > deadline:
+        raise RateLimitedError(delay)
+
+    metrics.increment("discord.ratelimit.wait")
+    await asyncio.sleep(delay)
+
+
+async def _wait_for_slot(route_key: str, major: str, *, use_global: bool, deadline: float) -> None:
+    while True:
+        delay = float(
+            await _acquire(
+                keys=[route_key, _GLOBAL_BLOCK_KEY],
+                args=[_PREFIX, major, int(use_global), constants.DISCORD_GLOBAL_RATE_LIMIT],
+                client=constants.REDIS_CLIENT,
+            )
+        )
+        if delay <= 0:
+            return
+
+        await _wait(delay, deadline)
+
+
+async def _record(route_key: str, major: str, response: httpx.Response) -> None:
+    headers = response.headers
+
+    if response.status_code == 429 and headers.get("X-RateLimit-Global"):
+        retry_after = float(headers["Retry-After"])
+        await constants.REDIS_CLIENT.set(
+            _GLOBAL_BLOCK_KEY,
+            (await _redis_time()) + retry_after,
+            px=int(retry_after * 1000) + 1,
+        )
+        return
+
+    if bucket := headers.get("X-RateLimit-Bucket"):
+        await _update(
+            keys=[route_key],
+            args=[
+                _PREFIX,
+                major,
+                bucket,
+                0 if response.status_code == 429 else headers["X-RateLimit-Remaining"],
+                headers["X-RateLimit-Reset-After"],
+            ],
+            client=constants.REDIS_CLIENT,
+        )
+
+
+async def _redis_time() -> float:
+    seconds, microseconds = await constants.REDIS_CLIENT.time()
+    return seconds + microseconds / 1_000_000
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    route: str,
+    major: str = "",
+    upstream: Upstream = Upstream.DISCORD,
+    use_global: bool = True,
+    max_wait: float = 10,
+    **kwargs: t.Any,
+) -> httpx.Response:
+    """
+    Send a request to Discord once its rate limits allow it.
+
+    `route` is the path with its parameters left as placeholders, such as
+    `/guilds/{guild_id}/members/{user_id}`, and `major` is the value of its major parameter.
+    Requests which aren't authenticated with the bot token, such as webhooks, should set
+    `use_global` to False.
+
+    If the request would have to wait more than `max_wait` seconds in total, `RateLimitedError`
+    is raised instead. A 429 is retried, within the same limit.
+    """
+    route_key = _route_key(method, route)
+    client = get_client(upstream)
+    deadline = asyncio.get_running_loop().time() + max_wait
+
+    while True:
+        await _wait_for_slot(route_key, major, use_global=use_global, deadline=deadline)
+
+        response = await client.request(method, url, **kwargs)
+        await _record(route_key, major, response)
+
+        if response.status_code != 429:
+            return response
+
+        metrics.increment("discord.ratelimit.429")
+        if not response.headers.get("X-RateLimit-Bucket"):
+            # Limits without a bucket, such as Cloudflare's, only say how long to wait
+            await _wait(float(response.headers.get("Retry-After", 1)), deadline)
+
+
+async def webhook_request(method: str, url: str, **kwargs: t.Any) -> httpx.Response:
+    """Send a request to a Discord webhook once its rate limits allow it."""
+    # Webhook URLs end with `/webhooks/{webhook_id}/{webhook_token}`
+    webhook_id = httpx.URL(url).path.rstrip("/").split("/")[-2]
+    return await request(
+        method,
+        url,
+        route="/webhooks/{webhook_id}/{webhook_token}",
+        major=webhook_id,
+        upstream=Upstream.WEBHOOK,
+        use_global=False,
+        **kwargs,
+    )
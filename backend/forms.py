@@ -0,0 +1,139 @@
+"""Loading and caching of forms shared by access checks and route handlers."""
+
+import asyncio
+import logging
+
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+from starlette.requests import Request
+
+from backend import constants, models, responses
+from backend.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Returned by MongoDB when change streams are used on a standalone server
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+
+# Validated forms are shared between requests, and must never be modified in place.
+_cache: LRUCache[str, models.Form] = LRUCache(
+    "forms",
+    maxsize=constants.FORM_CACHE_SIZE,
+    ttl=constants.FORM_CACHE_TTL,
+)
+
+# The public fields of forms, serialized. Keyed by form ID, instance and revision, so an updated
+# or recreated form is never served from an older entry, even by workers which missed the change.
+_public_cache: LRUCache[tuple[str, str | None, int], bytes] = LRUCache(
+    "public_forms",
+    maxsize=constants.FORM_CACHE_SIZE,
+    ttl=constants.PUBLIC_FORM_CACHE_TTL,
+)
+
+
+async def get_form(request: Request, form_id: str) -> models.Form | None:
+    """
+    Fetch and validate a form, at most once per request.
+
+    Access checks and route handlers both need the form, so the result is kept on the request
+    and later calls return the same `Form` object. None is returned if the form doesn't exist.
+
+    Forms are also cached by the worker, see `invalidate` for keeping the cache up to date.
+    """
+    loaded: dict[str, models.Form | None] | None = getattr(request.state, "forms", None)
+    if loaded is None:
+        loaded = request.state.forms = {}
+
+    if form_id not in loaded:
+        loaded[form_id] = await load_form(request.state.db, form_id)
+
+    return loaded[form_id]
+
+
+async def load_form(db: Database, form_id: str) -> models.Form | None:
+    """
+    Fetch and validate a form through the cache of this worker.
+
+    Prefer `get_form` while handling a request.
+    """
+    form = _cache.get(form_id)
+
+    if form is None:
+        raw_form = await db.forms.find_one({"_id": form_id})
+        if raw_form:
+            form = models.Form(**raw_form)
+            _cache.set(form_id, form)
+
+    return form
+
+
+def prime(form: models.Form) -> None:
+    """
+    Cache a form which was just written by this worker.
+
+    This replaces `invalidate` when the written form is at hand, so the next
+    request doesn't need to load and validate it again.
+    """
+    _cache.set(form.id, form)
+    public_json(form)
+
+
+def public_json(form: models.Form) -> bytes:
+    """Get the public fields of a form as JSON, serialized once per revision."""
+    key = (form.id, form.instance, form.revision)
+    body = _public_cache.get(key)
+
+    if body is None:
+        body = responses.dumps(form.dict(admin=False))
+        _public_cache.set(key, body)
+
+    return body
+
+
+def cached_public_json(form_id: str, instance: str | None, revision: int) -> bytes | None:
+    """Get the public fields of a revision of a form as JSON, if they are cached."""
+    return _public_cache.get((form_id, instance, revision))
+
+
+def invalidate(form_id: str) -> None:
+    """
+    Drop a form from the cache of this worker.
+
+    This must be called whenever a form is written. Other workers only see the change
+    once their entry expires, or through `watch_changes` if it's enabled.
+    """
+    _cache.pop(form_id)
+    # Older revisions are never served again, so they only take up space
+    _public_cache.remove_where(lambda key, _: key[0] == form_id)
+
+
+async def watch_changes(db: Database) -> None:
+    """
+    Invalidate cached forms as they are changed by any worker, using a MongoDB change stream.
+
+    Change streams require a replica set. On a standalone server this logs a warning
+    and returns, leaving the cache to rely on expiry alone.
+    """
+    while True:
+        try:
+            async with db.forms.watch() as stream:
+                # Changes may have been missed while the stream was down
+                _cache.clear()
+                _public_cache.clear()
+
+                async for change in stream:
+                    if document_key := change.get("documentKey"):
+                        invalidate(document_key["_id"])
+                    else:
+                        # Collection wide events, such as drops, don't name a document
+                        _cache.clear()
+                        _public_cache.clear()
+        except OperationFailure as e:
+            if e.code == _CHANGE_STREAMS_UNSUPPORTED:
+                logger.warning("Change streams are not supported, forms will only expire")
+                return
+            logger.exception("Form change stream failed, restarting")
+        except PyMongoError:
+            logger.exception("Form change stream failed, restarting")
+
+        await asyncio.sleep(constants.FORM_CACHE_CHANGE_STREAM_RETRY)
@@ -0,0 +1,72 @@
+"""Long-lived HTTP clients used for every outbound request made by the backend."""
+
+import enum
+import typing as t
+
+import httpx
+
+from backend import constants
+
+
+class Upstream(enum.StrEnum):
+    """The external services the backend talks to."""
+
+    DISCORD = "discord"
+    HCAPTCHA = "hcaptcha"
+    SNEKBOX = "snekbox"
+    WEBHOOK = "webhook"
+
+
+class UpstreamConfig(t.NamedTuple):
+    http2: bool
+    timeout: float
+
+
+UPSTREAMS = {
+    Upstream.DISCORD: UpstreamConfig(http2=True, timeout=10),
+    Upstream.HCAPTCHA: UpstreamConfig(http2=True, timeout=5),
+    # Snekbox is served over plain HTTP inside the cluster, which has no HTTP/2 negotiation
+    Upstream.SNEKBOX: UpstreamConfig(http2=False, timeout=10),
+    Upstream.WEBHOOK: UpstreamConfig(http2=True, timeout=5),
+}
+
+_clients: dict[Upstream, httpx.AsyncClient] = {}
+
+
+def open_clients(transport: httpx.AsyncBaseTransport | None = None) -> None:
+    """
+    Create one pooled client per upstream.
+
+    If `transport` is given, it replaces the network transport of every client.
+    This is the injection point for tests, which can pass an `httpx.MockTransport`.
+    """
+    limits = httpx.Limits(
+        max_connections=constants.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=constants.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=constants.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+    for upstream, config in UPSTREAMS.items():
+        _clients[upstream] = httpx.AsyncClient(
+            http2=config.http2,
+            timeout=config.timeout,
+            limits=limits,
+            transport=transport,
+        )
+
+
+async def close_clients() -> None:
+    """Close all clients, along with their pooled connections."""
+    for client in _clients.values():
+        await client.aclose()
+
+    _clients.clear()
+
+
+def get_client(upstream: Upstream) -> httpx.AsyncClient:
+    """Get the shared client for the given upstream."""
+    try:
+        return _clients[upstream]
+    except KeyError:
+        msg = f"No HTTP client is open for {upstream}, was open_clients called?"
+        raise RuntimeError(msg) from None
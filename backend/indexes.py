@@ -0,0 +1,161 @@
+"""
+Declarative registry of the MongoDB indexes used by the backend.
+
+The registry is applied on startup, and can be checked or applied by hand with:
+`python -m backend.indexes [--check]`
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import typing as t
+
+from pymongo import ASCENDING
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+from backend import constants, database
+
+logger = logging.getLogger(__name__)
+
+
+class Index(t.NamedTuple):
+    """A single index which should exist on a collection."""
+
+    collection: str
+    name: str
+    keys: list[tuple[str, int]]
+    unique: bool = False
+    partial_filter: dict[str, t.Any] | None = None
+
+    def matches(self, info: dict[str, t.Any]) -> bool:
+        """Check if the specification returned by `index_information` matches this index."""
+        return (
+            [tuple(key) for key in info["key"]] == self.keys
+            and info.get("unique", False) == self.unique
+            and info.get("partialFilterExpression") == self.partial_filter
+        )
+
+
+# Admins are only ever looked up by `_id`, which MongoDB always indexes.
+# Violations are only inserted, so they don't need an index.
+INDEXES = [
+    # Responses are listed by form, and looked up by form and user for UNIQUE_RESPONDER
+    Index("responses", "form_id_user_id", [("form_id", ASCENDING), ("user.id", ASCENDING)]),
+    # Responses are paged through and exported in `_id` order
+    Index("responses", "form_id_id", [("form_id", ASCENDING), ("_id", ASCENDING)]),
+    # Enforces UNIQUE_RESPONDER forms at insert time, see the form response schema
+    Index(
+        "responses",
+        "unique_responder",
+        [("form_id", ASCENDING), ("user.id", ASCENDING), ("unique_responder", ASCENDING)],
+        unique=True,
+        partial_filter={"unique_responder": True},
+    ),
+    # Discoverable forms are listed in name order
+    Index("forms", "features_name", [("features", ASCENDING), ("name", ASCENDING)]),
+]
+
+
+class IndexDrift(t.NamedTuple):
+    """Differences between the registry and the indexes which exist in the database."""
+
+    missing: list[Index]
+    changed: list[Index]
+    unexpected: list[tuple[str, str]]
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.changed or self.unexpected)
+
+
+async def check_indexes(db: Database) -> IndexDrift:
+    """Compare the indexes in the database to the registry."""
+    missing = []
+    changed = []
+    unexpected = []
+
+    for collection in sorted({index.collection for index in INDEXES}):
+        existing = await db[collection].index_information()
+        expected = {index.name: index for index in INDEXES if index.collection == collection}
+
+        for name, index in expected.items():
+            if name not in existing:
+                missing.append(index)
+            elif not index.matches(existing[name]):
+                changed.append(index)
+
+        unexpected.extend(
+            (collection, name) for name in existing if name != "_id_" and name not in expected
+        )
+
+    return IndexDrift(missing, changed, unexpected)
+
+
+def _report(drift: IndexDrift) -> None:
+    for index in drift.missing:
+        logger.warning("Index %s on %s is missing", index.name, index.collection)
+
+    for index in drift.changed:
+        logger.warning(
+            "Index %s on %s does not match the registry, it must be recreated by hand",
+            index.name,
+            index.collection,
+        )
+
+    for collection, name in drift.unexpected:
+        logger.warning("Index %s on %s is not in the registry", name, collection)
+
+
+async def apply_indexes(db: Database) -> IndexDrift:
+    """
+    Create any missing indexes, and report the drift which was found.
+
+    Changed and unexpected indexes are only reported, as dropping an index can take down
+    queries that rely on it. Those have to be resolved by hand.
+    """
+    drift = await check_indexes(db)
+    _report(drift._replace(missing=[]))
+
+    for index in drift.missing:
+        options = {"name": index.name, "unique": index.unique}
+        if index.partial_filter is not None:
+            options["partialFilterExpression"] = index.partial_filter
+
+        try:
+            await db[index.collection].create_index(index.keys, **options)
+        except OperationFailure:
+            logger.exception("Could not create index %s on %s", index.name, index.collection)
+        else:
+            logger.info("Created index %s on %s", index.name, index.collection)
+
+    return drift
+
+
+async def _main(*, check: bool) -> int:
+    client = database.create_client()
+    db = client[constants.MONGO_DATABASE]
+
+    try:
+        if check:
+            drift = await check_indexes(db)
+            _report(drift)
+        else:
+            drift = await apply_indexes(db)
+    finally:
+        client.close()
+
+    return 1 if check and drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report drift, and exit with a non-zero status if any is found.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    sys.exit(asyncio.run(_main(check=args.check)))
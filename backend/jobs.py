@@ -0,0 +1,234 @@
+"""
+A durable job queue in Redis, for work which shouldn't hold up or be lost with a web worker.
+
+Jobs are enqueued by the web workers and run by `python -m backend.worker`.
+
+Every job has a key, which makes enqueueing idempotent: a job is only added if no job with the
+same key is queued, running, or finished within `JOB_DONE_RETENTION` seconds. Jobs which are
+claimed but never finished, for example because the worker died, run again after
+`JOB_VISIBILITY_TIMEOUT` seconds. Failed jobs are retried with exponential backoff and jitter,
+and moved to a dead-letter list after `JOB_MAX_ATTEMPTS` attempts.
+"""
+
+import enum
+import json
+import random
+import time
+import typing as t
+
+from pymongo.database import Database
+
+from backend import constants
+
+_PREFIX = "forms-backend:jobs"
+QUEUE_KEY = f"{_PREFIX}:queue"  # List of job keys which are ready to run
+DELAYED_KEY = f"{_PREFIX}:delayed"  # Sorted set of job keys by when they're due
+RUNNING_KEY = f"{_PREFIX}:running"  # Sorted set of job keys by when their claim runs out
+DATA_KEY = f"{_PREFIX}:data"  # Hash of job keys to jobs
+DEAD_KEY = f"{_PREFIX}:dead"  # List of jobs which failed too many times
+_DONE_PREFIX = f"{_PREFIX}:done"
+
+_KEYS = [QUEUE_KEY, DELAYED_KEY, RUNNING_KEY, DATA_KEY, DEAD_KEY]
+
+_ENQUEUE_SCRIPT = """
+local queue, delayed, data = KEYS[1], KEYS[2], KEYS[4]
+local done, key, job, run_at = ARGV[1], ARGV[2], ARGV[3], tonumber(ARGV[4])
+
+if redis.call("EXISTS", done) == 1 or redis.call("HSETNX", data, key, job) == 0 then
+    return 0
+end
+if run_at > 0 then
+    redis.call("ZADD", delayed, run_at, key)
+else
+    redis.call("LPUSH", queue, key)
+end
+return 1
+"""
+
+_CLAIM_SCRIPT = """
+local queue, delayed, running, data = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local now, visibility = tonumber(ARGV[1]), tonumber(ARGV[2])
+
+for _, set in ipairs({delayed, running}) do
+    local due = redis.call("ZRANGEBYSCORE", set, "-inf", now)
+    for _, key in ipairs(due) do
+        redis.call("ZREM", set, key)
+        redis.call("RPUSH", queue, key)
+    end
+end
+
+-- Keys without data belong to jobs which were finished after their claim ran out
+while true do
+    local key = redis.call("RPOP", queue)
+    if not key then
+        return nil
+    end
+    local job = redis.call("HGET", data, key)
+    if job then
+        redis.call("ZADD", running, now + visibility, key)
+        return job
+    end
+end
+"""
+
+_FINISH_SCRIPT = """
+local running, data = KEYS[3], KEYS[4]
+local done, key, retention = ARGV[1], ARGV[2], ARGV[3]
+
+redis.call("ZREM", running, key)
+redis.call("HDEL", data, key)
+redis.call("SET", done, 1, "EX", retention)
+"""
+
+_RETRY_SCRIPT = """
+local delayed, running, data = KEYS[2], KEYS[3], KEYS[4]
+local key, job, run_at = ARGV[1], ARGV[2], ARGV[3]
+
+redis.call("ZREM", running, key)
+redis.call("HSET", data, key, job)
+redis.call("ZADD", delayed, run_at, key)
+"""
+
+_BURY_SCRIPT = """
+local running, data, dead = KEYS[3], KEYS[4], KEYS[5]
+local key, job = ARGV[1], ARGV[2]
+
+redis.call("ZREM", running, key)
+redis.call("HDEL", data, key)
+redis.call("LPUSH", dead, job)
+"""
+
+_enqueue = constants.REDIS_CLIENT.register_script(_ENQUEUE_SCRIPT)
+_claim = constants.REDIS_CLIENT.register_script(_CLAIM_SCRIPT)
+_finish = constants.REDIS_CLIENT.register_script(_FINISH_SCRIPT)
+_retry = constants.REDIS_CLIENT.register_script(_RETRY_SCRIPT)
+_bury = constants.REDIS_CLIENT.register_script(_BURY_SCRIPT)
+
+
+class JobKind(enum.StrEnum):
+    """The kinds of jobs, each of which has a handler registered in the worker."""
+
+    SUBMISSION_WEBHOOK = "submission_webhook"
+    FLUSH_WEBHOOK_BATCH = "flush_webhook_batch"
+    ASSIGN_ROLE = "assign_role"
+
+
+class Job(t.NamedTuple):
+    """A unit of work, with the arguments its handler needs to load everything else."""
+
+    key: str
+    kind: JobKind
+    args: dict[str, t.Any]
+    attempts: int = 0
+    error: str | None = None
+
+    def dump(self) -> str:
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def load(cls, data: str | bytes) -> t.Self:
+        job = json.loads(data)
+        job["kind"] = JobKind(job["kind"])
+        return cls(**job)
+
+
+class RetryLaterError(Exception):
+    """
+    Raised by handlers to run the job again after `delay` seconds.
+
+    This doesn't count as a failed attempt, and is used when an upstream asks to be
+    called back later, such as on a rate limit.
+    """
+
+    def __init__(self, delay: float) -> None:
+        super().__init__(f"Retry after {delay} seconds.")
+        self.delay = delay
+
+
+type Handler = t.Callable[[Database, Job], t.Awaitable[None]]
+
+HANDLERS: dict[JobKind, Handler] = {}
+
+
+def handler(kind: JobKind) -> t.Callable[[Handler], Handler]:
+    """Register the decorated function as the handler for a kind of job."""
+
+    def decorator(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def _done_key(key: str) -> str:
+    return f"{_DONE_PREFIX}:{key}"
+
+
+async def enqueue(kind: JobKind, key: str, *, delay: float = 0, **args: t.Any) -> bool:
+    """
+    Add a job to the queue, unless a job with the same key exists or has recently finished.
+
+    The key should identify the work, such as the kind of job and the response it's for.
+    Returns True if the job was added.
+    """
+    job = Job(f"{kind}:{key}", kind, args)
+    run_at = time.time() + delay if delay else 0
+    added = await _enqueue(
+        keys=_KEYS,
+        args=[_done_key(job.key), job.key, job.dump(), run_at],
+        client=constants.REDIS_CLIENT,
+    )
+    return bool(added)
+
+
+async def claim() -> Job | None:
+    """Take the next job which is ready to run, if there is one."""
+    data = await _claim(
+        keys=_KEYS,
+        args=[time.time(), constants.JOB_VISIBILITY_TIMEOUT],
+        client=constants.REDIS_CLIENT,
+    )
+    return Job.load(data) if data else None
+
+
+async def finish(job: Job) -> None:
+    """Mark a claimed job as done."""
+    await _finish(
+        keys=_KEYS,
+        args=[_done_key(job.key), job.key, constants.JOB_DONE_RETENTION],
+        client=constants.REDIS_CLIENT,
+    )
+
+
+async def retry_later(job: Job, delay: float) -> None:
+    """Run a claimed job again after `delay` seconds, without counting it as an attempt."""
+    await _retry(
+        keys=_KEYS,
+        args=[job.key, job.dump(), time.time() + delay],
+        client=constants.REDIS_CLIENT,
+    )
+
+
+def backoff(attempts: int) -> float:
+    """Get a delay before the next attempt, growing exponentially with full jitter."""
+    ceiling = min(constants.JOB_MAX_BACKOFF, constants.JOB_BASE_BACKOFF * 2**attempts)
+    return random.uniform(0, ceiling)
+
+
+async def fail(job: Job, error: str) -> None:
+    """
+    Record a failed attempt at a claimed job.
+
+    The job is retried after a backoff, or moved to the dead-letter list if it has
+    run out of attempts.
+    """
+    job = job._replace(attempts=job.attempts + 1, error=error)
+
+    if job.attempts >= constants.JOB_MAX_ATTEMPTS:
+        await _bury(keys=_KEYS, args=[job.key, job.dump()], client=constants.REDIS_CLIENT)
+    else:
+        await _retry(
+            keys=_KEYS,
+            args=[job.key, job.dump(), time.time() + backoff(job.attempts)],
+            client=constants.REDIS_CLIENT,
+        )
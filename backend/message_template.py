@@ -0,0 +1,48 @@
+"""Webhook messages with variables wrapped in braces, as documented in SCHEMA.md."""
+
+import re
+
+# Available variables, see SCHEMA.md
+VARIABLES = frozenset({"user", "response_id", "form", "form_id", "time"})
+
+# Older forms mention the user with this instead of `{user}`
+_LEGACY_USER_MENTION = "_USER_MENTION_"
+
+_VARIABLE = re.compile(r"\{(\w+)\}")
+
+
+class MessageTemplate:
+    """
+    A webhook message, parsed once so rendering it is a single join.
+
+    The parsed template alternates between literal text and variable names,
+    starting and ending with text. Names in braces which aren't variables are kept as text,
+    as forms saved before messages were checked may contain them.
+    """
+
+    __slots__ = ("_segments", "unknown")
+
+    def __init__(self, message: str) -> None:
+        message = message.replace(_LEGACY_USER_MENTION, "{user}")
+        parts = _VARIABLE.split(message)
+
+        self.unknown = frozenset(parts[1::2]) - VARIABLES
+        self._segments = [parts[0]]
+        for name, text in zip(parts[1::2], parts[2::2], strict=True):
+            if name in self.unknown:
+                self._segments[-1] += f"{{{name}}}{text}"
+            else:
+                self._segments += [name, text]
+
+    def check(self) -> None:
+        """Raise a `ValueError` if the message uses names which aren't variables."""
+        if self.unknown:
+            names = ", ".join(f"{{{name}}}" for name in sorted(self.unknown))
+            msg = f"Unknown variables in message: {names}."
+            raise ValueError(msg)
+
+    def render(self, context: dict[str, str]) -> str:
+        """Fill in the variables of the message. `context` must have a value for every variable."""
+        segments = self._segments.copy()
+        segments[1::2] = [context[name] for name in segments[1::2]]
+        return "".join(segments)
@@ -0,0 +1,15 @@
+"""Process-local counters, exposed to admins through the metrics route."""
+
+import collections
+
+_counters: collections.Counter[str] = collections.Counter()
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Increment the named counter."""
+    _counters[name] += value
+
+
+def snapshot() -> dict[str, int]:
+    """Return the current value of every counter."""
+    return dict(sorted(_counters.items()))
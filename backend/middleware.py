@@ -1,22 +1,73 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+import math
+
+import sentry_sdk
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
-from starlette.responses import JSONResponse
-from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend import database, rate_limits
+from backend.constants import DOCS_PASSWORD, PRODUCTION
+from backend.responses import JSONResponse
+
+
+class RoundTripMiddleware:
+    """
+    Count the MongoDB round-trips made while handling each request.
+
+    The count is recorded as a measurement on the Sentry transaction of the route,
+    and returned in the `X-Mongo-Round-Trips` header outside of production.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self._app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        with database.count_round_trips() as round_trips:
 
-from backend.constants import DATABASE_URL, DOCS_PASSWORD, MONGO_DATABASE
+            async def send_with_count(message: Message) -> None:
+                if message["type"] == "http.response.start" and not PRODUCTION:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-Mongo-Round-Trips", str(round_trips.count))
+                await send(message)
 
+            await self._app(scope, receive, send_with_count)
+
+        sentry_sdk.set_measurement("mongo_round_trips", round_trips.count)
+
+
+class RateLimitMiddleware:
+    """
+    Reject requests to rate limited routes once their client runs out, see `backend.rate_limits`.
+
+    This runs before authentication, so rejected requests never reach MongoDB, Discord or snekbox.
+    """
 
-class DatabaseMiddleware:
     def __init__(self, app: ASGIApp) -> None:
         self._app = app
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        client: AsyncIOMotorClient = AsyncIOMotorClient(
-            DATABASE_URL,
-            tlsAllowInvalidCertificates=True,
-        )
-        db = client[MONGO_DATABASE]
-        Request(scope).state.db = db
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        if matched := rate_limits.match(request):
+            route, form_id = matched
+            retry_after = await rate_limits.acquire(route, form_id, request)
+
+            if retry_after:
+                resp = JSONResponse(
+                    {"error": "rate_limited", "retry_after": retry_after},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+                await resp(scope, receive, send)
+                return
+
         await self._app(scope, receive, send)
 
 
@@ -25,6 +76,11 @@ class ProtectedDocsMiddleware:
         self._app = app
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            # Lifespan events must reach the application untouched
+            await self._app(scope, receive, send)
+            return
+
         request = Request(scope)
         if DOCS_PASSWORD and request.url.path.startswith("/docs"):
             if request.cookies.get("docs_password") != DOCS_PASSWORD:
@@ -1,10 +1,12 @@
 import typing as t
 
 import httpx
-from pydantic import BaseModel, Field, constr, root_validator, validator
+from pydantic import BaseModel, Field, PrivateAttr, constr, root_validator, validator
 from pydantic.error_wrappers import ErrorWrapper, ValidationError
 
+from backend import discord_ratelimit
 from backend.constants import DISCORD_GUILD, FormFeatures, WebHook
+from backend.message_template import MessageTemplate
 
 from .question import Question
 
@@ -20,6 +22,9 @@ PUBLIC_FIELDS = [
     "submission_precheck",
 ]
 
+# In seconds, longer windows would make announcements too stale to act on
+MAX_WEBHOOK_BATCH_WINDOW = 60 * 10
+
 
 class _WebHook(BaseModel):
     """Schema model of discord webhooks."""
@@ -27,6 +32,7 @@ class _WebHook(BaseModel):
     url: str
     message: str | None
     thread_id: str | None = None
+    batch_window: int | None = None
 
     @validator("url")
     def validate_url(cls, url: str) -> str:
@@ -46,6 +52,15 @@ class _WebHook(BaseModel):
 
         return thread_id
 
+    @validator("batch_window")
+    def validate_batch_window(cls, batch_window: int | None) -> int | None:
+        """Validates batch_window parameter."""
+        if batch_window is not None and not 1 <= batch_window <= MAX_WEBHOOK_BATCH_WINDOW:
+            msg = f"Batch window must be between 1 and {MAX_WEBHOOK_BATCH_WINDOW} seconds."
+            raise ValueError(msg)
+
+        return batch_window
+
 
 class Form(BaseModel):
     """Schema model for form."""
@@ -60,6 +75,13 @@ class Form(BaseModel):
     discord_role: str | None
     response_readers: list[str] | None
     editors: list[str] | None
+    # Incremented by every update, see `SingleForm.patch`
+    revision: int = 0
+    # Set when the form is created, so a form created again with the same ID is a new instance
+    instance: str | None = None
+
+    # Values derived from the form, see `memoize`
+    _memo: dict[t.Hashable, t.Any] = PrivateAttr(default_factory=dict)
 
     class Config:
         allow_population_by_field_name = True
@@ -106,6 +128,17 @@ class Form(BaseModel):
 
         return values
 
+    def memoize[T](self, key: t.Hashable, factory: t.Callable[[], T]) -> T:
+        """
+        Get a value derived from this form, computing it with `factory` the first time.
+
+        Forms are cached between requests and never modified, so the value lives as long as
+        this version of the form does.
+        """
+        if key not in self._memo:
+            self._memo[key] = factory()
+        return self._memo[key]
+
     def dict(self, admin: bool = True, **kwargs) -> dict[str, t.Any]:  # noqa: FBT001, FBT002
         """Wrapper for original function to exclude private data for public access."""
         data = super().dict(**kwargs)
@@ -144,9 +177,8 @@ async def validate_hook_url(url: str) -> ValidationError | None:
             raise ValueError(msg)
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
-                response.raise_for_status()
+            response = await discord_ratelimit.webhook_request("GET", url)
+            response.raise_for_status()
 
         except httpx.RequestError as error:
             # Catch exceptions in request format
@@ -179,3 +211,24 @@ async def validate_hook_url(url: str) -> ValidationError | None:
         )
 
         return ValidationError([ErrorWrapper(e, loc=loc)], _WebHook)
+
+
+def validate_hook_message(message: str | None) -> ValidationError | None:
+    """
+    Validator for the variables of webhook messages.
+
+    This isn't a validator of `_WebHook`, as messages saved before they were checked
+    must still load. Only forms being created or edited are checked.
+    """
+    try:
+        if message is not None:
+            MessageTemplate(message).check()
+    except ValueError as e:
+        loc = (
+            WebHook.__name__.lower(),
+            WebHook.MESSAGE.value,
+        )
+
+        return ValidationError([ErrorWrapper(e, loc=loc)], _WebHook)
+
+    return None
@@ -0,0 +1,159 @@
+"""
+Token bucket limits on expensive routes, kept in Redis so they hold across all workers.
+
+Each client has a bucket per route and form, keyed by both their IP and, when they're logged in,
+their Discord ID. A request takes a token from every bucket of its client, and is rejected if
+any of them is empty. Buckets refill continuously, up to their capacity.
+
+Limits are written as `<requests>/<seconds>`, and forms can be given their own limits with
+`<form id>=<requests>/<seconds>` pairs separated by commas.
+"""
+
+import hashlib
+import re
+import typing as t
+
+import jwt
+from starlette.requests import Request
+
+from backend import constants, metrics
+
+_PREFIX = "forms-backend:rate_limit"
+
+# Takes a token from every bucket in KEYS, or returns how long to wait until they all have one
+_ACQUIRE_SCRIPT = """
+local capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local state = redis.call("HMGET", key, "tokens", "updated")
+    local available = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+
+    available = math.min(capacity, available + (now - updated) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+
+if wait > 0 then
+    return tostring(wait)
+end
+
+for i, key in ipairs(KEYS) do
+    redis.call("HSET", key, "tokens", tokens[i] - 1, "updated", now)
+    redis.call("EXPIRE", key, math.ceil(capacity / rate))
+end
+return "0"
+"""
+
+_acquire = constants.REDIS_CLIENT.register_script(_ACQUIRE_SCRIPT)
+
+
+class Limit(t.NamedTuple):
+    """A number of requests allowed per period, which can also be made in a burst."""
+
+    requests: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> t.Self:
+        requests, period = value.split("/")
+        return cls(int(requests), float(period))
+
+
+def _parse_form_limits(value: str) -> dict[str, Limit]:
+    limits = {}
+    for pair in filter(None, value.split(",")):
+        form_id, limit = pair.split("=")
+        limits[form_id.strip().lower()] = Limit.parse(limit.strip())
+    return limits
+
+
+class LimitedRoute(t.NamedTuple):
+    """A route whose requests are rate limited, with the form ID captured from its path."""
+
+    name: str
+    method: str
+    path: re.Pattern[str]
+    limit: Limit
+    form_limits: dict[str, Limit]
+
+    def limit_for(self, form_id: str) -> Limit:
+        return self.form_limits.get(form_id, self.limit)
+
+
+ROUTES = [
+    LimitedRoute(
+        "submit",
+        "POST",
+        re.compile(r"/forms/submit/(?P<form_id>[^/]+)/?"),
+        Limit.parse(constants.SUBMIT_RATE_LIMIT),
+        _parse_form_limits(constants.SUBMIT_FORM_RATE_LIMITS),
+    ),
+]
+
+
+def match(request: Request) -> tuple[LimitedRoute, str] | None:
+    """Find the limited route and form ID of a request, if it's to a limited route."""
+    for route in ROUTES:
+        if request.method == route.method and (m := route.path.fullmatch(request.url.path)):
+            return route, m["form_id"].lower()
+    return None
+
+
+def _user_id(request: Request) -> str | None:
+    """
+    Get the Discord ID of a logged in user from their token.
+
+    Only the signature is checked, as looking the user up would defeat the purpose of
+    limiting before any other work is done.
+    """
+    cookie = request.cookies.get("token", "")
+    prefix, _, token = cookie.partition(" ")
+    if prefix.upper() != "JWT":
+        return None
+
+    try:
+        payload = jwt.decode(token, constants.SECRET_KEY, algorithms=["HS256"])
+        return str(payload["user_details"]["id"])
+    except (jwt.InvalidTokenError, KeyError, TypeError):
+        return None
+
+
+def identities(request: Request) -> list[str]:
+    """Identify the client of a request, the same way as the antispam data of a submission."""
+    ip = request.headers.get("Cf-Connecting-IP", request.client.host if request.client else "")
+    keys = [f"ip:{hashlib.md5(ip.encode()).hexdigest()}"]
+
+    if user_id := _user_id(request):
+        keys.append(f"user:{user_id}")
+
+    return keys
+
+
+async def acquire(route: LimitedRoute, form_id: str, request: Request) -> float:
+    """
+    Take a token for a request to a limited route.
+
+    Returns 0 if the request may go ahead, or how many seconds to wait before retrying.
+    """
+    limit = route.limit_for(form_id)
+    keys = [f"{_PREFIX}:{route.name}:{form_id}:{identity}" for identity in identities(request)]
+
+    retry_after = float(
+        await _acquire(
+            keys=keys,
+            args=[limit.requests, limit.requests / limit.period],
+            client=constants.REDIS_CLIENT,
+        )
+    )
+
+    if retry_after:
+        metrics.increment(f"rate_limit.{route.name}.rejected")
+    return retry_after
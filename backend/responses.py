@@ -0,0 +1,87 @@
+"""JSON responses serialized with orjson, which every route uses instead of Starlette's."""
+
+import hashlib
+import typing as t
+
+import orjson
+from pydantic import BaseModel
+from starlette import responses
+from starlette.requests import Request
+
+from backend import constants
+
+
+def _default(obj: t.Any) -> t.Any:
+    """Serialize the types orjson doesn't handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+
+    msg = f"Object of type {type(obj).__name__} is not JSON serializable"
+    raise TypeError(msg)
+
+
+def dumps(content: t.Any) -> bytes:
+    """
+    Serialize content to JSON.
+
+    Datetimes, enums and pydantic models are serialized natively, and non-string keys,
+    such as the integer indexes of condorcet tallies, are converted to strings.
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class JSONResponse(responses.JSONResponse):
+    """A `starlette.responses.JSONResponse` serialized with orjson."""
+
+    def render(self, content: t.Any) -> bytes:
+        return dumps(content)
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an `If-None-Match` header, which compares tags weakly."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def add_fields(body: bytes, fields: dict[str, t.Any]) -> bytes:
+    """Add fields to a serialized JSON object, without parsing it again."""
+    if body == b"{}":
+        return dumps(fields)
+    return body[:-1] + b"," + dumps(fields)[1:]
+
+
+def conditional_json(request: Request, content: t.Any, *, public: bool) -> responses.Response:
+    """
+    Respond with JSON tagged by a hash of its content, or a 304 if the client has it already.
+
+    Public responses may be cached by shared caches, such as a CDN, for `PUBLIC_CACHE_MAX_AGE`
+    seconds. Responses which depend on the user must not be public, and are only revalidated
+    by the user's browser.
+
+    Parts of the content which are already serialized can be included as `orjson.Fragment`.
+    """
+    return conditional_body(request, dumps(content), public=public)
+
+
+def conditional_body(request: Request, body: bytes, *, public: bool) -> responses.Response:
+    """Respond with JSON which is already serialized, like `conditional_json`."""
+    headers = {
+        "ETag": _etag(body),
+        # Anything that depends on the user is keyed by their token cookie
+        "Vary": "Cookie",
+        "Cache-Control": (
+            f"public, max-age={constants.PUBLIC_CACHE_MAX_AGE}" if public else "private, no-cache"
+        ),
+    }
+
+    if _matches(request.headers.get("If-None-Match"), headers["ETag"]):
+        return responses.Response(status_code=304, headers=headers)
+
+    return responses.Response(body, media_type="application/json", headers=headers)
@@ -4,9 +4,9 @@ from pydantic import BaseModel, Field
 from spectree import Response
 from starlette.authentication import requires
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
-from backend import constants
+from backend import authentication, constants
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.validation import ErrorMessage, OkayResponse, api
 
@@ -26,6 +26,7 @@ async def grant(request: Request) -> JSONResponse:
         return JSONResponse({"error": "already_exists"}, status_code=400)
 
     await request.state.db.admins.insert_one(admin.dict(by_alias=True))
+    authentication.invalidate_user(admin.id)
     return JSONResponse({"status": "ok"})
 
 
@@ -15,10 +15,11 @@ from backend import constants
 from backend.authentication.user import User
 from backend.constants import SECRET_KEY
 from backend.discord import fetch_bearer_token, fetch_user_details, get_member
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.validation import ErrorMessage, api
 
-AUTH_FAILURE = responses.JSONResponse({"error": "auth_failure"}, status_code=400)
+AUTH_FAILURE = JSONResponse({"error": "auth_failure"}, status_code=400)
 
 
 class AuthorizeRequest(BaseModel):
@@ -33,7 +34,7 @@ class AuthorizeResponse(BaseModel):
 async def process_token(
     bearer_token: dict,
     request: Request,
-) -> AuthorizeResponse | responses.JSONResponse:
+) -> AuthorizeResponse | JSONResponse:
     """Post a bearer token to Discord, and return a JWT and username."""
     interaction_start = datetime.datetime.now()
 
@@ -63,7 +64,7 @@ async def process_token(
     token = jwt.encode(data, SECRET_KEY, algorithm="HS256")
     user = User(token, user_details, member)
 
-    response = responses.JSONResponse({
+    response = JSONResponse({
         "username": user.display_name,
         "expiry": token_expiry.isoformat(),
     })
@@ -115,7 +116,7 @@ class AuthorizeRoute(Route):
         resp=Response(HTTP_200=AuthorizeResponse, HTTP_400=ErrorMessage),
         tags=["auth"],
     )
-    async def post(self, request: Request) -> responses.JSONResponse:
+    async def post(self, request: Request) -> JSONResponse:
         """Generate an authorization token."""
         data = await request.json()
         try:
@@ -138,7 +139,7 @@ class TokenRefreshRoute(Route):
         resp=Response(HTTP_200=AuthorizeResponse, HTTP_400=ErrorMessage),
         tags=["auth"],
     )
-    async def post(self, request: Request) -> responses.JSONResponse:
+    async def post(self, request: Request) -> JSONResponse:
         """Refresh an authorization token."""
         try:
             token = request.user.decoded_token.get("refresh")
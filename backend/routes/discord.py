@@ -3,10 +3,10 @@
 import pydantic
 from spectree import Response
 from starlette.authentication import requires
-from starlette.responses import JSONResponse
 from starlette.routing import Request
 
-from backend import discord, models, route
+from backend import authentication, discord, models, route
+from backend.responses import JSONResponse
 from backend.validation import ErrorMessage, api
 
 NOT_FOUND_EXCEPTION = JSONResponse(
@@ -34,6 +34,7 @@ class RolesRoute(route.Route):
     async def patch(self, request: Request) -> JSONResponse:  # noqa: ARG002 Request is required by @requires
         """Refresh the roles database."""
         roles = await discord.get_roles(force_refresh=True)
+        authentication.invalidate_all()
 
         return JSONResponse(
             {"roles": [role.dict() for role in roles]},
@@ -61,6 +62,7 @@ class MemberRoute(route.Route):
         """Force a resync of the cache for the given user."""
         body = await request.json()
         member = await discord.get_member(body["user_id"], force_refresh=True)
+        authentication.invalidate_user(body["user_id"])
 
         if member:
             return JSONResponse(member.dict())
@@ -1,15 +1,14 @@
 """Calculate the condorcet winner for a given question on a poll."""
 
-from condorcet import CondorcetEvaluator
 from pydantic import BaseModel
 from spectree import Response
 from starlette import exceptions
 from starlette.authentication import requires
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
-from backend import discord
-from backend.models import Form, FormResponse, Question
+from backend import discord, tallies
+from backend.models import Question
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.validation import api
 
@@ -24,16 +23,6 @@ class InvalidCondorcetRequest(exceptions.HTTPException):
     """The request for a condorcet calculation was invalid."""
 
 
-def reprocess_vote_object(vote: dict[str, int | None], number_options: int) -> dict[str, int]:
-    """Reprocess votes so all no-preference votes are re-ranked as last (equivalent in Condorcet)."""
-    vote_object = {}
-
-    for option, score in vote.items():
-        vote_object[option] = score or number_options
-
-    return vote_object
-
-
 class Condorcet(Route):
     """Run a condorcet calculation on the given question on a form."""
 
@@ -60,11 +49,7 @@ class Condorcet(Route):
         except ValueError:
             raise InvalidCondorcetRequest(detail="Invalid number of winners", status_code=400)
 
-        await discord.verify_response_access(form_id, request)
-
-        # We can assume we have a form now because verify_response_access
-        # checks for form existence.
-        form_data = Form(**(await request.state.db.forms.find_one({"_id": form_id})))
+        form_data = await discord.verify_response_access(form_id, request)
 
         questions = [question for question in form_data.questions if question.id == question_id]
 
@@ -83,19 +68,8 @@ class Condorcet(Route):
                 detail="Requested question is not a condorcet vote component", status_code=400
             )
 
-        cursor = request.state.db.responses.find(
-            {"form_id": form_id},
-        )
-        responses = [FormResponse(**response) for response in await cursor.to_list(None)]
-
-        votes = [
-            reprocess_vote_object(response.response[question_id], len(question.data["options"]))
-            for response in responses
-        ]
-
-        evaluator = CondorcetEvaluator(candidates=question.data["options"], votes=votes)
-
-        winners, rest_of_table = evaluator.get_n_winners(num_winners)
+        tally = await tallies.get_tally(request.state.db, form_data, question)
+        winners, rest_of_table = tally.winners(num_winners)
 
         return JSONResponse({
             "question": question.dict(),
@@ -1,11 +1,13 @@
 """Return a list of all publicly discoverable forms to unauthenticated users."""
 
+import orjson
 from spectree.response import Response
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import Response as RawResponse
 
-from backend import constants
+from backend import constants, forms
 from backend.models import Form, FormList, Question
+from backend.responses import conditional_json
 from backend.route import Route
 from backend.validation import api
 
@@ -40,17 +42,40 @@ class DiscoverableFormsList(Route):
     name = "discoverable_forms_list"
     path = "/discoverable"
 
-    @api.validate(resp=Response(HTTP_200=FormList), tags=["forms"])
-    async def get(self, request: Request) -> JSONResponse:
-        """List all discoverable forms that should be shown on the homepage."""
-        cursor = request.state.db.forms.find({"features": "DISCOVERABLE"}).sort("name")
+    @api.validate(resp=Response("HTTP_304", HTTP_200=FormList), tags=["forms"])
+    async def get(self, request: Request) -> RawResponse:
+        """
+        List all discoverable forms that should be shown on the homepage.
 
-        # Parse it to Form and then back to dictionary
-        # to replace _id with id
-        forms = [Form(**form).dict(admin=False) for form in await cursor.to_list(None)]
+        The list is the same for every user, so it may be cached by shared caches.
+        """
+        # Only the revisions are read at first, to find the forms which are already serialized
+        cursor = request.state.db.forms.find(
+            {"features": "DISCOVERABLE"},
+            {"instance": True, "revision": True},
+        ).sort("name")
+        listed = [
+            (form["_id"], form.get("instance"), form.get("revision", 0))
+            for form in await cursor.to_list(None)
+        ]
+        bodies = {
+            form_id: forms.cached_public_json(form_id, instance, revision)
+            for form_id, instance, revision in listed
+        }
+
+        if missing := [form_id for form_id, body in bodies.items() if body is None]:
+            cursor = request.state.db.forms.find({"_id": {"$in": missing}})
+            for raw_form in await cursor.to_list(None):
+                form = Form(**raw_form)
+                bodies[form.id] = forms.public_json(form)
+
+        # Forms may have been deleted between the two reads
+        public_forms = [
+            orjson.Fragment(bodies[form_id]) for form_id, *_ in listed if bodies[form_id]
+        ]
 
         # Return an empty form in development environments to help with authentication.
         if not constants.PRODUCTION:
-            forms.append(AUTH_FORM.dict(admin=False))
+            public_forms.append(AUTH_FORM.dict(admin=False))
 
-        return JSONResponse(forms)
+        return conditional_json(request, public_forms, public=True)
@@ -0,0 +1,143 @@
+"""Streams all responses of a form as NDJSON or CSV."""
+
+import csv
+import enum
+import io
+import typing as t
+
+from pydantic import Field
+from starlette.authentication import requires
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from backend import discord
+from backend.models import Form, FormResponse
+from backend.responses import JSONResponse, dumps
+from backend.route import Route
+from backend.routes.forms.responses import (
+    QuestionSelection,
+    response_projection,
+    unknown_questions,
+)
+from backend.validation import api
+
+# Responses are read from the database and written out in batches of this size,
+# so memory use doesn't grow with the number of responses.
+BATCH_SIZE = 100
+
+
+class ExportFormat(enum.StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ExportQuery(QuestionSelection):
+    format: ExportFormat = Field(ExportFormat.NDJSON, description="The format of the export.")
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def _ndjson_rows(responses: list[FormResponse], _questions: list[str]) -> str:
+    return b"".join(dumps(response.dict()) + b"\n" for response in responses).decode()
+
+
+def _csv_value(answer: t.Any) -> str | None:
+    """Write structured answers, such as checkboxes and votes, as JSON."""
+    if answer is None or isinstance(answer, str):
+        return answer
+    return dumps(answer).decode()
+
+
+def _csv_rows(responses: list[FormResponse], questions: list[str]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for response in responses:
+        writer.writerow(
+            [
+                response.id,
+                response.user.id if response.user else None,
+                response.user.username if response.user else None,
+                response.timestamp,
+                *(_csv_value(response.response.get(question)) for question in questions),
+            ],
+        )
+
+    return buffer.getvalue()
+
+
+def _csv_header(questions: list[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["id", "user_id", "username", "timestamp", *questions])
+    return buffer.getvalue()
+
+
+async def _stream(
+    request: Request,
+    form: Form,
+    query: ExportQuery,
+) -> t.AsyncIterator[str]:
+    questions = query.questions or [question.id for question in form.questions]
+    write_rows = _csv_rows if query.format == ExportFormat.CSV else _ndjson_rows
+
+    if query.format == ExportFormat.CSV:
+        yield _csv_header(questions)
+
+    cursor = (
+        request.state.db.responses.find(
+            {"form_id": form.id},
+            response_projection(query.questions),
+        )
+        .sort("_id")
+        .batch_size(BATCH_SIZE)
+    )
+
+    batch = []
+    async for response in cursor:
+        batch.append(FormResponse(**response))
+        if len(batch) == BATCH_SIZE:
+            yield write_rows(batch, questions)
+            batch = []
+
+    if batch:
+        yield write_rows(batch, questions)
+
+
+class ResponsesExport(Route):
+    """Streams all responses of a form."""
+
+    name = "form_responses_export"
+    path = "/{form_id:str}/export"
+
+    @requires(["authenticated"])
+    @api.validate(
+        # Streamed bodies can't be validated, so no response models are declared
+        query=ExportQuery,
+        tags=["forms", "responses"],
+    )
+    async def get(self, request: Request) -> StreamingResponse | JSONResponse:
+        """
+        Streams all responses of a form, in order of response ID.
+
+        Responses are written as one JSON object per line with `?format=ndjson`, or as one
+        row per response with `?format=csv`. `?questions=` limits the answers to the given
+        comma separated question IDs.
+        """
+        form_id = request.path_params["form_id"]
+        form = await discord.verify_response_access(form_id, request)
+        query: ExportQuery = request.context.query
+
+        if unknown := unknown_questions(form, query.questions):
+            return JSONResponse({"error": "unknown_questions", "ids": unknown}, status_code=400)
+
+        return StreamingResponse(
+            _stream(request, form, query),
+            media_type=MEDIA_TYPES[query.format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{form_id}.{query.format}"',
+            },
+        )
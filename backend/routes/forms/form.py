@@ -2,17 +2,21 @@
 
 import enum
 import json.decoder
+import typing as t
 
 import deepmerge
 from pydantic import BaseModel, ValidationError
 from spectree.response import Response
 from starlette.authentication import requires
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import Response as RawResponse
 
-from backend import constants, discord
+from backend import constants, discord, forms, summaries, tallies
 from backend.models import Form
+from backend.models.form import validate_hook_message
+from backend.responses import JSONResponse, add_fields, conditional_body, conditional_json
 from backend.route import Route
+from backend.routes.forms import unittesting
 from backend.routes.forms.discover import AUTH_FORM
 from backend.validation import ErrorMessage, OkayResponse, api
 
@@ -46,6 +50,33 @@ class FormWithAncillaryData(Form):
     submission_precheck: SubmissionPrecheck = SubmissionPrecheck()
 
 
+def diff_update(old: dict[str, t.Any], new: dict[str, t.Any], prefix: str = "") -> dict:
+    """
+    Build an update which changes the document `old` into `new`.
+
+    Nested objects are compared field by field, while lists and other values are
+    replaced whole when they differ.
+    """
+    update = {"$set": {}, "$unset": {}}
+
+    for key, value in new.items():
+        path = f"{prefix}{key}"
+        if key not in old:
+            update["$set"][path] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested = diff_update(old[key], value, f"{path}.")
+            update["$set"].update(nested.get("$set", {}))
+            update["$unset"].update(nested.get("$unset", {}))
+        elif value != old[key]:
+            update["$set"][path] = value
+
+    for key in old.keys() - new.keys():
+        update["$unset"][f"{prefix}{key}"] = ""
+
+    # MongoDB rejects empty operators
+    return {operator: fields for operator, fields in update.items() if fields}
+
+
 class SingleForm(Route):
     """
     Returns, updates or deletes a single form given an ID.
@@ -57,10 +88,16 @@ class SingleForm(Route):
     path = "/{form_id:str}"
 
     @api.validate(
-        resp=Response(HTTP_200=FormWithAncillaryData, HTTP_404=ErrorMessage), tags=["forms"]
+        resp=Response("HTTP_304", HTTP_200=FormWithAncillaryData, HTTP_404=ErrorMessage),
+        tags=["forms"],
     )
-    async def get(self, request: Request) -> JSONResponse:
-        """Returns single form information by ID."""
+    async def get(self, request: Request) -> RawResponse:
+        """
+        Returns single form information by ID.
+
+        Forms are tagged with an ETag, and may be cached by shared caches unless the user is
+        logged in, as the precheck and admin fields depend on the user.
+        """
         form_id = request.path_params["form_id"].lower()
 
         if form_id == AUTH_FORM.id:
@@ -68,36 +105,32 @@ class SingleForm(Route):
             data = AUTH_FORM.dict(admin=False)
             # Add in empty ancillary data
             data["submission_precheck"] = SubmissionPrecheck().dict()
-            return JSONResponse(data)
+            return conditional_json(request, data, public=True)
 
         try:
-            await discord.verify_edit_access(form_id, request)
+            form = await discord.verify_edit_access(form_id, request)
             admin = True
         except discord.FormNotFoundError:
             return JSONResponse({"error": "not_found"}, status_code=404)
         except discord.UnauthorizedError:
+            form = await forms.get_form(request, form_id)
             admin = False
 
-        filters = {
-            "_id": form_id,
-        }
-
-        if not admin:
-            filters["features"] = {"$in": ["OPEN", "DISCOVERABLE"]}
-
-        form = await request.state.db.forms.find_one(filters)
-        form = FormWithAncillaryData(**form)
-        if not form:
+        if not admin and not any(
+            feature.value in form.features for feature in PUBLIC_FORM_FEATURES
+        ):
             return JSONResponse({"error": "not_found"}, status_code=404)
 
+        submission_precheck = SubmissionPrecheck()
+
         if constants.FormFeatures.OPEN.value not in form.features:
-            form.submission_precheck.problems.append(
+            submission_precheck.problems.append(
                 SubmissionProblem(
                     severity=SubmissionPrecheckSeverity.DANGER,
                     message="This form is not open for submissions at the moment.",
                 )
             )
-            form.submission_precheck.can_submit = False
+            submission_precheck.can_submit = False
         elif constants.FormFeatures.UNIQUE_RESPONDER.value in form.features:
             user_id = request.user.payload["id"] if request.user.is_authenticated else None
             if user_id:
@@ -106,22 +139,32 @@ class SingleForm(Route):
                     "user.id": user_id,
                 })
                 if existing_response:
-                    form.submission_precheck.problems.append(
+                    submission_precheck.problems.append(
                         SubmissionProblem(
                             severity=SubmissionPrecheckSeverity.DANGER,
                             message="You have already submitted a response to this form.",
                         )
                     )
-                    form.submission_precheck.can_submit = False
+                    submission_precheck.can_submit = False
             else:
-                form.submission_precheck.problems.append(
+                submission_precheck.problems.append(
                     SubmissionProblem(
                         severity=SubmissionPrecheckSeverity.SECONDARY,
                         message="You must login at the bottom of the page before submitting this form.",
                     )
                 )
 
-        return JSONResponse(form.dict(admin=admin))
+        public = not request.user.is_authenticated
+        if admin:
+            data = form.dict()
+            data["submission_precheck"] = submission_precheck.dict()
+            return conditional_json(request, data, public=public)
+
+        body = add_fields(
+            forms.public_json(form),
+            {"submission_precheck": submission_precheck.dict()},
+        )
+        return conditional_body(request, body, public=public)
 
     @requires(["authenticated"])
     @api.validate(
@@ -129,11 +172,19 @@ class SingleForm(Route):
             HTTP_200=OkayResponse,
             HTTP_400=ErrorMessage,
             HTTP_404=ErrorMessage,
+            HTTP_409=ErrorMessage,
         ),
         tags=["forms"],
     )
     async def patch(self, request: Request) -> JSONResponse:
-        """Updates form by ID."""
+        """
+        Updates form by ID.
+
+        The body is merged into the form, and only the fields which changed are written.
+        Set `revision` to the revision of the form the changes were made to, and the update
+        is rejected with a 409 if the form has been updated since. Without it, the changes
+        are made to the latest revision.
+        """
         try:
             data = await request.json()
         except json.decoder.JSONDecodeError:
@@ -142,29 +193,62 @@ class SingleForm(Route):
         form_id = request.path_params["form_id"].lower()
         await discord.verify_edit_access(form_id, request)
 
-        if raw_form := await request.state.db.forms.find_one({"_id": form_id}):
-            if "_id" in data or "id" in data:
-                if (data.get("id") or data.get("_id")) != form_id:
-                    return JSONResponse({"error": "locked_field"}, status_code=400)
+        # The cached form may be outdated, and would be the wrong base for the changes
+        raw_form = await request.state.db.forms.find_one({"_id": form_id})
+        if raw_form is None:
+            return JSONResponse({"error": "not_found"}, status_code=404)
+        current_form = Form(**raw_form)
 
-            # Build Data Merger
-            merge_strategy = [
-                (dict, ["merge"]),
-            ]
-            merger = deepmerge.Merger(merge_strategy, ["override"], ["override"])
+        if "_id" in data or "id" in data:
+            if (data.get("id") or data.get("_id")) != form_id:
+                return JSONResponse({"error": "locked_field"}, status_code=400)
 
-            # Merge Form Data
-            updated_form = merger.merge(raw_form, data)
+        expected_revision = data.pop("revision", current_form.revision)
+        if not isinstance(expected_revision, int):
+            return JSONResponse({"error": "invalid_revision"}, status_code=400)
 
-            try:
-                form = Form(**updated_form)
-            except ValidationError as e:
-                return JSONResponse(e.errors(), status_code=422)
+        # Build Data Merger
+        merge_strategy = [
+            (dict, ["merge"]),
+        ]
+        merger = deepmerge.Merger(merge_strategy, ["override"], ["override"])
 
-            await request.state.db.forms.replace_one({"_id": form_id}, form.dict())
+        # Merge Form Data
+        updated_form = merger.merge(current_form.dict(by_alias=True), data)
+        updated_form["revision"] = expected_revision + 1
+        updated_form["instance"] = current_form.instance
 
-            return JSONResponse(form.dict())
-        return JSONResponse({"error": "not_found"}, status_code=404)
+        try:
+            form = Form(**updated_form)
+        except ValidationError as e:
+            return JSONResponse(e.errors(), status_code=422)
+
+        # Messages saved before they were checked are only rejected once they're edited
+        message = form.webhook and form.webhook.message
+        if message != (current_form.webhook and current_form.webhook.message):
+            if validation := validate_hook_message(message):
+                return JSONResponse(validation.errors(), status_code=422)
+
+        update = diff_update(current_form.dict(), form.dict())
+        # Forms created before revisions were added don't have one stored
+        stored_revision = (
+            [expected_revision, None] if expected_revision == 0 else [expected_revision]
+        )
+
+        result = await request.state.db.forms.update_one(
+            {"_id": form_id, "revision": {"$in": stored_revision}},
+            update,
+        )
+        if not result.matched_count:
+            # So the client reads the latest revision when it tries again
+            forms.invalidate(form_id)
+            return JSONResponse({"error": "revision_conflict"}, status_code=409)
+
+        forms.prime(form)
+        unittesting.build_harnesses(form)
+        await summaries.invalidate(form_id)
+
+        return JSONResponse(form.dict())
 
     @requires(["authenticated", "admin"])
     @api.validate(
@@ -177,6 +261,9 @@ class SingleForm(Route):
         await discord.verify_edit_access(form_id, request)
 
         await request.state.db.forms.delete_one({"_id": form_id})
+        forms.invalidate(form_id)
         await request.state.db.responses.delete_many({"form_id": form_id})
+        await tallies.delete(request.state.db, form_id)
+        await summaries.invalidate(form_id)
 
         return JSONResponse({"status": "ok"})
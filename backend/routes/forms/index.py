@@ -1,14 +1,18 @@
 """Return a list of all forms to authenticated users."""
 
+import uuid
+
 from spectree.response import Response
 from starlette.authentication import requires
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
+from backend import forms
 from backend.constants import WebHook
 from backend.models import Form, FormList
-from backend.models.form import validate_hook_url
+from backend.models.form import validate_hook_message, validate_hook_url
+from backend.responses import JSONResponse
 from backend.route import Route
+from backend.routes.forms import unittesting
 from backend.validation import ErrorMessage, OkayResponse, api
 
 
@@ -53,10 +57,16 @@ class FormsList(Route):
         except KeyError:
             pass
 
-        form = Form(**form_data)
+        # A new form starts over, whatever it was created from
+        form = Form(**form_data | {"revision": 0, "instance": uuid.uuid4().hex})
+
+        if form.webhook and (validation := validate_hook_message(form.webhook.message)):
+            return JSONResponse(validation.errors(), status_code=422)
 
         if await request.state.db.forms.find_one({"_id": form.id}):
             return JSONResponse({"error": "id_taken"}, status_code=400)
 
         await request.state.db.forms.insert_one(form.dict(by_alias=True))
+        forms.prime(form)
+        unittesting.build_harnesses(form)
         return JSONResponse(form.dict())
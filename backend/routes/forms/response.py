@@ -3,10 +3,10 @@
 from spectree import Response as RouteResponse
 from starlette.authentication import requires
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
-from backend import discord
+from backend import discord, forms, summaries, tallies
 from backend.models import FormResponse
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.validation import ErrorMessage, OkayResponse, api
 
@@ -44,15 +44,20 @@ class Response(Route):
     )
     async def delete(self, request: Request) -> JSONResponse:
         """Delete a form response by ID."""
-        if not await request.state.db.responses.find_one(
+        form = await forms.get_form(request, request.path_params["form_id"])
+        raw_response = await request.state.db.responses.find_one(
             {
                 "_id": request.path_params["response_id"],
                 "form_id": request.path_params["form_id"],
             },
-        ):
+        )
+        if not form or not raw_response:
             return JSONResponse({"error": "not_found"}, status_code=404)
 
-        await request.state.db.responses.delete_one(
+        result = await request.state.db.responses.delete_one(
             {"_id": request.path_params["response_id"]},
         )
+        if result.deleted_count:
+            await tallies.retract(request.state.db, form, [FormResponse(**raw_response)])
+            await summaries.invalidate(form.id)
         return JSONResponse({"status": "ok"})
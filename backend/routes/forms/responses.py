@@ -1,21 +1,68 @@
 """Returns all form responses by form ID."""
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, validator
 from spectree import Response
 from starlette.authentication import requires
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
-from backend import discord
-from backend.models import FormResponse, ResponseList
+from backend import discord, forms, summaries, tallies
+from backend.models import Form, FormResponse, ResponseList
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.validation import ErrorMessage, OkayResponse, api
 
+# The most responses returned in one page
+MAX_PAGE_SIZE = 1000
+
+# Fields returned when responses are projected to a subset of questions
+_RESPONSE_FIELDS = ("_id", "user", "antispam", "form_id", "timestamp")
+
 
 class ResponseIdList(BaseModel):
     ids: list[str]
 
 
+class QuestionSelection(BaseModel):
+    questions: list[str] | None = Field(
+        description="Comma separated IDs of the questions to include in each response.",
+    )
+
+    @validator("questions", pre=True)
+    def split_questions(cls, value: str | list[str] | None) -> list[str] | None:
+        if isinstance(value, str):
+            value = [value]
+        if value is None:
+            return None
+        questions = [question for item in value for question in item.split(",") if question]
+        # An empty selection, such as `?questions=`, selects every question
+        return questions or None
+
+
+class ResponsePage(QuestionSelection):
+    after: str | None = Field(description="Only return responses with an ID after this one.")
+    limit: int | None = Field(
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="The most responses to return. All responses are returned if not set.",
+    )
+
+
+def unknown_questions(form: Form, questions: list[str] | None) -> list[str]:
+    """Return the selected question IDs which are not part of the form."""
+    known = {question.id for question in form.questions}
+    return [question for question in questions or [] if question not in known]
+
+
+def response_projection(questions: list[str] | None) -> dict[str, bool] | None:
+    """Build a projection which only includes the answers to the selected questions."""
+    if questions is None:
+        return None
+
+    projection = dict.fromkeys(_RESPONSE_FIELDS, True)
+    projection.update({f"response.{question}": True for question in questions})
+    return projection
+
+
 class Responses(Route):
     """Returns all form responses by form ID."""
 
@@ -24,19 +71,48 @@ class Responses(Route):
 
     @requires(["authenticated"])
     @api.validate(
-        resp=Response(HTTP_200=ResponseList),
+        query=ResponsePage,
+        resp=Response(HTTP_200=ResponseList, HTTP_400=ErrorMessage),
         tags=["forms", "responses"],
     )
     async def get(self, request: Request) -> JSONResponse:
-        """Returns all form responses by form ID."""
+        """
+        Returns form responses by form ID, in order of response ID.
+
+        Responses can be paged through with `?limit=`, and `?after=` set to the ID of the
+        last response on the previous page. The next page is linked in the `Link` header.
+        `?questions=` limits the answers to the given comma separated question IDs.
+
+        Use the export route to download all responses of large forms.
+        """
         form_id = request.path_params["form_id"]
-        await discord.verify_response_access(form_id, request)
+        form = await discord.verify_response_access(form_id, request)
+        query: ResponsePage = request.context.query
+
+        if unknown := unknown_questions(form, query.questions):
+            return JSONResponse({"error": "unknown_questions", "ids": unknown}, status_code=400)
+
+        filter_ = {"form_id": form_id}
+        if query.after is not None:
+            filter_["_id"] = {"$gt": query.after}
 
         cursor = request.state.db.responses.find(
-            {"form_id": form_id},
-        )
-        responses = [FormResponse(**response) for response in await cursor.to_list(None)]
-        return JSONResponse([response.dict() for response in responses])
+            filter_,
+            response_projection(query.questions),
+        ).sort("_id")
+        if query.limit is not None:
+            # Fetch one extra response to know if there is another page
+            cursor = cursor.limit(query.limit + 1)
+
+        responses = [FormResponse(**response).dict() async for response in cursor]
+
+        headers = {}
+        if query.limit is not None and len(responses) > query.limit:
+            del responses[query.limit :]
+            next_page = request.url.include_query_params(after=responses[-1]["id"])
+            headers["Link"] = f'<{next_page}>; rel="next"'
+
+        return JSONResponse(responses, headers=headers)
 
     @requires(["authenticated", "admin"])
     @api.validate(
@@ -50,9 +126,8 @@ class Responses(Route):
     )
     async def delete(self, request: Request) -> JSONResponse:
         """Bulk deletes form responses by IDs."""
-        if not await request.state.db.forms.find_one(
-            {"_id": request.path_params["form_id"]},
-        ):
+        form = await forms.get_form(request, request.path_params["form_id"])
+        if not form:
             return JSONResponse({"error": "not_found"}, status_code=404)
 
         data = await request.json()
@@ -92,4 +167,6 @@ class Responses(Route):
                 "_id": {"$in": list(actual_ids)},
             },
         )
+        await tallies.retract(request.state.db, form, entries)
+        await summaries.invalidate(form.id)
         return JSONResponse({"status": "ok"})
@@ -9,17 +9,19 @@ import uuid
 from typing import Any
 
 import httpx
+import orjson
 import sentry_sdk
 from pydantic import ValidationError
 from pydantic.main import BaseModel
+from pymongo.errors import DuplicateKeyError
 from spectree import Response
-from starlette.background import BackgroundTasks
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
-from backend import constants
+from backend import captcha, constants, forms, jobs, summaries, tallies
 from backend.authentication.user import User
-from backend.models import Form, FormResponse
+from backend.jobs import JobKind
+from backend.models import AntiSpam, Form, FormResponse
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.routes.auth.authorize import set_response_token
 from backend.routes.forms.discover import AUTH_FORM
@@ -29,13 +31,14 @@ from backend.validation import ErrorMessage, api
 if typing.TYPE_CHECKING:
     import pymongo.database
 
-HCAPTCHA_VERIFY_URL = "https://hcaptcha.com/siteverify"
-HCAPTCHA_HEADERS = {
-    "Content-Type": "application/x-www-form-urlencoded",
+UNIQUE_RESPONDER_ERROR = {
+    "error": "unique_responder",
+    "message": "You have already submitted this form.",
 }
 
-DISCORD_HEADERS = {
-    "Authorization": f"Bot {constants.DISCORD_BOT_TOKEN}",
+CAPTCHA_REPLAYED_ERROR = {
+    "error": "captcha_replayed",
+    "message": "This captcha was already used, please complete it again.",
 }
 
 
@@ -61,6 +64,155 @@ class UnittestErrorMessage(ErrorMessage):
     test_results: list[UnittestError]
 
 
+class SubmissionRejectedError(Exception):
+    """A submission failed a check, and is answered with `response`."""
+
+    def __init__(self, response: JSONResponse) -> None:
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def _antispam_hashes(request: Request) -> dict[str, str]:
+    ip_hash_ctx = hashlib.md5()
+    ip_hash_ctx.update(
+        request.headers.get(
+            "Cf-Connecting-IP",
+            request.client.host,
+        ).encode(),
+    )
+    ip_hash = binascii.hexlify(ip_hash_ctx.digest())
+    user_agent_hash_ctx = hashlib.md5()
+    user_agent_hash_ctx.update(request.headers["User-Agent"].encode())
+    user_agent_hash = binascii.hexlify(user_agent_hash_ctx.digest())
+
+    return {
+        "ip_hash": ip_hash.decode(),
+        "user_agent_hash": user_agent_hash.decode(),
+    }
+
+
+async def verify_captcha(token: str | None) -> bool:
+    """Check whether hCaptcha accepts a captcha token."""
+    with sentry_sdk.start_span(op="submit.captcha", description="Verify the captcha"):
+        try:
+            return await captcha.verify(token)
+        except captcha.CaptchaReplayedError:
+            raise SubmissionRejectedError(JSONResponse(CAPTCHA_REPLAYED_ERROR, status_code=400))
+
+
+async def check_unique_responder(db: "pymongo.database.Database", form: Form, user_id: str) -> None:
+    """Reject the submission if the user has already responded to the form."""
+    with sentry_sdk.start_span(
+        op="submit.unique_responder", description="Find an earlier response"
+    ):
+        existing_response = await db.responses.find_one(
+            {
+                "form_id": form.id,
+                "user.id": user_id,
+            },
+        )
+
+    if existing_response:
+        raise SubmissionRejectedError(JSONResponse(UNIQUE_RESPONDER_ERROR, status_code=400))
+
+
+def parse_response(request: Request, form: Form, data: dict[str, Any]) -> FormResponse:
+    """Run the checks on a submission which don't wait on other services, and parse it."""
+    response = data.copy()
+    response["id"] = str(uuid.uuid4())
+    response["form_id"] = form.id
+
+    if constants.FormFeatures.REQUIRES_LOGIN.value in form.features:
+        if request.user.is_authenticated:
+            response["user"] = request.user.payload
+            response["user"]["admin"] = request.user.admin
+
+            if (
+                constants.FormFeatures.COLLECT_EMAIL.value in form.features
+                and "email" not in response["user"]
+            ):
+                raise SubmissionRejectedError(
+                    JSONResponse({"error": "email_required"}, status_code=400)
+                )
+        else:
+            raise SubmissionRejectedError(
+                JSONResponse({"error": "missing_discord_data"}, status_code=400)
+            )
+
+    if (
+        constants.FormFeatures.UNIQUE_RESPONDER.value in form.features
+        and not request.user.is_authenticated
+    ):
+        raise SubmissionRejectedError(
+            JSONResponse({"error": "missing_discord_data"}, status_code=400)
+        )
+
+    missing_fields = []
+    for question in form.questions:
+        if question.id not in response["response"]:
+            if not question.required:
+                response["response"][question.id] = None
+            else:
+                missing_fields.append(question.id)
+
+    if missing_fields:
+        raise SubmissionRejectedError(
+            JSONResponse(
+                {
+                    "error": "missing_fields",
+                    "fields": missing_fields,
+                },
+                status_code=400,
+            )
+        )
+
+    try:
+        return FormResponse(**response)
+    except ValidationError as e:
+        raise SubmissionRejectedError(JSONResponse(e.errors(), status_code=422))
+
+
+async def validate_submission(request: Request, form: Form, data: dict[str, Any]) -> FormResponse:
+    """
+    Check a submission to a form, and parse it into a response.
+
+    The captcha and the unique responder lookup wait on other services, so they run
+    concurrently with each other and with the local checks. The first check to fail
+    cancels the rest, and is raised as `SubmissionRejectedError`.
+    """
+    check_captcha = constants.FormFeatures.DISABLE_ANTISPAM.value not in form.features
+    check_unique = (
+        constants.FormFeatures.UNIQUE_RESPONDER.value in form.features
+        and request.user.is_authenticated
+    )
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            if check_captcha:
+                captcha_pass = tg.create_task(verify_captcha(data.get("captcha")))
+            if check_unique:
+                tg.create_task(
+                    check_unique_responder(request.state.db, form, request.user.payload["id"])
+                )
+
+            # Let the requests go out before the local checks
+            await asyncio.sleep(0)
+            with sentry_sdk.start_span(op="submit.validate", description="Validate the response"):
+                response_obj = parse_response(request, form, data)
+    # Raise the first failure as the checks did before they ran concurrently, preferring
+    # rejections over errors such as hCaptcha or MongoDB being unavailable
+    except* Exception as group:  # noqa: BLE001
+        rejections = [e for e in group.exceptions if isinstance(e, SubmissionRejectedError)]
+        raise (rejections or group.exceptions)[0] from None
+
+    if check_captcha:
+        response_obj.antispam = AntiSpam(
+            **_antispam_hashes(request), captcha_pass=captcha_pass.result()
+        )
+
+    return response_obj
+
+
 class SubmitForm(Route):
     """Submit a form with the provided form ID."""
 
@@ -119,101 +271,17 @@ class SubmitForm(Route):
             ).dict()
             return JSONResponse({"form": AUTH_FORM.dict(admin=False), "response": response})
 
-        if form := await request.state.db.forms.find_one({"_id": form_id, "features": "OPEN"}):
-            form = Form(**form)
-            response = data.copy()
-            response["id"] = str(uuid.uuid4())
-            response["form_id"] = form.id
-
-            if constants.FormFeatures.DISABLE_ANTISPAM.value not in form.features:
-                ip_hash_ctx = hashlib.md5()
-                ip_hash_ctx.update(
-                    request.headers.get(
-                        "Cf-Connecting-IP",
-                        request.client.host,
-                    ).encode(),
-                )
-                ip_hash = binascii.hexlify(ip_hash_ctx.digest())
-                user_agent_hash_ctx = hashlib.md5()
-                user_agent_hash_ctx.update(request.headers["User-Agent"].encode())
-                user_agent_hash = binascii.hexlify(user_agent_hash_ctx.digest())
-
-                async with httpx.AsyncClient() as client:
-                    query_params = {
-                        "secret": constants.HCAPTCHA_API_SECRET,
-                        "response": data.get("captcha"),
-                    }
-                    r = await client.post(
-                        HCAPTCHA_VERIFY_URL,
-                        params=query_params,
-                        headers=HCAPTCHA_HEADERS,
-                    )
-                    r.raise_for_status()
-                    captcha_data = r.json()
-
-                response["antispam"] = {
-                    "ip_hash": ip_hash.decode(),
-                    "user_agent_hash": user_agent_hash.decode(),
-                    "captcha_pass": captcha_data["success"],
-                }
-
-            if constants.FormFeatures.REQUIRES_LOGIN.value in form.features:
-                if request.user.is_authenticated:
-                    response["user"] = request.user.payload
-                    response["user"]["admin"] = request.user.admin
-
-                    if (
-                        constants.FormFeatures.COLLECT_EMAIL.value in form.features
-                        and "email" not in response["user"]
-                    ):
-                        return JSONResponse({"error": "email_required"}, status_code=400)
-                else:
-                    return JSONResponse({"error": "missing_discord_data"}, status_code=400)
-
-            if constants.FormFeatures.UNIQUE_RESPONDER.value in form.features:
-                if not request.user.is_authenticated:
-                    return JSONResponse({"error": "missing_discord_data"}, status_code=400)
-
-                existing_response = await request.state.db.responses.find_one(
-                    {
-                        "form_id": form.id,
-                        "user.id": request.user.payload["id"],
-                    },
-                )
-                if existing_response:
-                    return JSONResponse(
-                        {
-                            "error": "unique_responder",
-                            "message": "You have already submitted this form.",
-                        },
-                        status_code=400,
-                    )
-
-            missing_fields = []
-            for question in form.questions:
-                if question.id not in response["response"]:
-                    if not question.required:
-                        response["response"][question.id] = None
-                    else:
-                        missing_fields.append(question.id)
-
-            if missing_fields:
-                return JSONResponse(
-                    {
-                        "error": "missing_fields",
-                        "fields": missing_fields,
-                    },
-                    status_code=400,
-                )
-
+        form = await forms.get_form(request, form_id)
+        if form and constants.FormFeatures.OPEN.value in form.features:
             try:
-                response_obj = FormResponse(**response)
-            except ValidationError as e:
-                return JSONResponse(e.errors(), status_code=422)
+                response_obj = await validate_submission(request, form, data)
+            except SubmissionRejectedError as e:
+                return e.response
 
             # Run unittests if needed
             if any("unittests" in question.data for question in form.questions):
-                unittest_results, errors = await execute_unittest(response_obj, form)
+                with sentry_sdk.start_span(op="submit.unittests", description="Run unittests"):
+                    unittest_results, errors = await execute_unittest(response_obj, form)
 
                 if len(errors):
                     username = getattr(request.user, "user_id", "Unknown")
@@ -277,127 +345,48 @@ class SubmitForm(Route):
                         status_code=status_code,
                     )
 
-            await request.state.db.responses.insert_one(
-                response_obj.dict(by_alias=True),
-            )
+            document = response_obj.dict(by_alias=True)
+            if constants.FormFeatures.UNIQUE_RESPONDER.value in form.features:
+                # Covered by a unique partial index, which catches concurrent submissions
+                # that all passed the lookup above.
+                document["unique_responder"] = True
 
-            tasks = BackgroundTasks()
+            # Checked last, so a submission which failed another check can be retried
+            # with the same captcha
+            if response_obj.antispam is not None and not await captcha.spend(data.get("captcha")):
+                return JSONResponse(CAPTCHA_REPLAYED_ERROR, status_code=400)
+
+            with sentry_sdk.start_span(op="submit.store", description="Store the response"):
+                try:
+                    await request.state.db.responses.insert_one(document)
+                except DuplicateKeyError:
+                    return JSONResponse(UNIQUE_RESPONDER_ERROR, status_code=400)
+
+                await tallies.record(request.state.db, form, response_obj)
+                await summaries.invalidate(form.id)
+
+            # Run by the job worker, so Discord's rate limits don't hold up the submission
             if constants.FormFeatures.WEBHOOK_ENABLED.value in form.features:
-                if constants.FormFeatures.REQUIRES_LOGIN.value in form.features:
-                    request_user = request.user
-                else:
-                    request_user = None
-                tasks.add_task(
-                    self.send_submission_webhook,
-                    form=form,
-                    response=response_obj,
-                    request_user=request_user,
+                await jobs.enqueue(
+                    JobKind.SUBMISSION_WEBHOOK,
+                    response_obj.id,
+                    form_id=form.id,
+                    response_id=response_obj.id,
                 )
 
             if constants.FormFeatures.ASSIGN_ROLE.value in form.features:
-                tasks.add_task(
-                    self.assign_role,
-                    form=form,
-                    request_user=request.user,
+                await jobs.enqueue(
+                    JobKind.ASSIGN_ROLE,
+                    response_obj.id,
+                    form_id=form.id,
+                    user_id=request.user.payload["id"],
                 )
 
             return JSONResponse(
                 {
-                    "form": form.dict(admin=False),
+                    "form": orjson.Fragment(forms.public_json(form)),
                     "response": response_obj.dict(),
                 },
-                background=tasks,
             )
 
         return JSONResponse({"error": "Open form not found"}, status_code=404)
-
-    @staticmethod
-    async def send_submission_webhook(
-        form: Form,
-        response: FormResponse,
-        request_user: User | None,
-    ) -> None:
-        """Helper to send a submission message to a discord webhook."""
-        # Stop if webhook is not available
-        if form.webhook is None:
-            msg = "Got empty webhook."
-            raise ValueError(msg)
-
-        try:
-            mention = request_user.discord_mention
-        except AttributeError:
-            mention = "A user"
-
-        # Build Embed
-        embed = {
-            "title": "New Form Response",
-            "description": f"{mention} submitted a response to `{form.name}`.",
-            "url": f"https://forms-api.pythondiscord.com/forms/{form.id}/responses/{response.id}",
-            "timestamp": response.timestamp,
-            "color": 7506394,
-        }
-
-        # Add author to embed
-        if request_user and request_user.is_authenticated:
-            user = response.user
-            embed["author"] = {"name": request_user.display_name}
-
-            if user and user.avatar:
-                url = f"https://cdn.discordapp.com/avatars/{user.id}/{user.avatar}.png"
-                embed["author"]["icon_url"] = url
-
-        # Build Hook
-        hook = {
-            "embeds": [embed],
-            "allowed_mentions": {"parse": ["users", "roles"]},
-            "username": form.name or "Python Discord Forms",
-        }
-
-        # Set hook message
-        message = form.webhook.message
-        if message:
-            # Available variables, see SCHEMA.md
-            ctx = {
-                "user": mention,
-                "response_id": response.id,
-                "form": form.name,
-                "form_id": form.id,
-                "time": response.timestamp,
-            }
-
-            for key, val in ctx.items():
-                message = message.replace(f"{{{key}}}", str(val))
-
-            hook["content"] = message.replace("_USER_MENTION_", mention)
-
-        params = {}
-
-        if form.webhook.thread_id:
-            params["thread_id"] = form.webhook.thread_id
-
-        # Post hook
-        async with httpx.AsyncClient() as client:
-            r = await client.post(form.webhook.url, json=hook, params=params)
-            r.raise_for_status()
-
-    @staticmethod
-    async def assign_role(form: Form, request_user: User) -> None:
-        """Assigns Discord role to user when user submitted response."""
-        if not form.discord_role:
-            msg = "Got empty Discord role ID."
-            raise ValueError(msg)
-
-        url = (
-            f"{constants.DISCORD_API_BASE_URL}/guilds/{constants.DISCORD_GUILD}"
-            f"/members/{request_user.payload["id"]}/roles/{form.discord_role}"
-        )
-
-        async with httpx.AsyncClient() as client:
-            resp = await client.put(url, headers=DISCORD_HEADERS)
-            # Handle Rate Limits
-            while resp.status_code == 429:
-                retry_after = float(resp.headers["X-Ratelimit-Reset-After"])
-                await asyncio.sleep(retry_after)
-                resp = await client.put(url, headers=DISCORD_HEADERS)
-
-            resp.raise_for_status()
@@ -0,0 +1,49 @@
+"""Summarises the answers to each question of a form."""
+
+from pydantic import BaseModel
+from spectree import Response
+from starlette.authentication import requires
+from starlette.requests import Request
+from starlette.responses import Response as RawResponse
+
+from backend import discord, summaries
+from backend.route import Route
+from backend.validation import api
+
+
+class QuestionSummary(BaseModel):
+    type: str
+    answers: int
+    nulls: int
+    options: dict[str, int] | None
+
+
+class FormSummary(BaseModel):
+    form_id: str
+    responses: int
+    questions: dict[str, QuestionSummary]
+
+
+class ResponseSummary(Route):
+    """Summarises the answers to each question of a form."""
+
+    name = "form_summary"
+    path = "/{form_id:str}/summary"
+
+    @requires(["authenticated"])
+    @api.validate(
+        resp=Response(HTTP_200=FormSummary),
+        tags=["forms", "responses"],
+    )
+    async def get(self, request: Request) -> RawResponse:
+        """
+        Returns how many responses answered each question, and how many left it empty.
+
+        The answers to `radio`, `checkbox`, `select` and `range` questions are also counted
+        per option, including options nobody chose.
+        """
+        form = await discord.verify_response_access(request.path_params["form_id"], request)
+        summary = await summaries.get_summary(request.state.db, form)
+
+        # The summary is cached already serialized
+        return RawResponse(summary, media_type="application/json")
@@ -1,18 +1,31 @@
+import asyncio
 import base64
+import hashlib
+import json
 from itertools import count
 from pathlib import Path
 from textwrap import indent
 from typing import NamedTuple
 
-import httpx
 from httpx import HTTPStatusError
 
-from backend.constants import SNEKBOX_URL
-from backend.models import Form, FormResponse
+from backend import constants, metrics
+from backend.http_clients import Upstream, get_client
+from backend.models import Form, FormResponse, Question
+from backend.semaphore import FairSemaphore
 
 with Path("resources/unittest_template.py").open(encoding="utf8") as file:
     TEST_TEMPLATE = file.read()
 
+# Held for each evaluation, with a lease well over the snekbox client timeout
+_snekbox_slots = FairSemaphore(
+    "snekbox",
+    limit=constants.SNEKBOX_MAX_CONCURRENCY,
+    process_limit=constants.SNEKBOX_PROCESS_CONCURRENCY,
+    lease=60,
+    acquire_timeout=constants.SNEKBOX_ACQUIRE_TIMEOUT,
+)
+
 
 class BypassDetectedError(Exception):
     """Detected an attempt at bypassing the unittests."""
@@ -52,117 +65,199 @@ def _make_user_code(code: str) -> str:
     return f'USER_CODE = b"{code}"'
 
 
+def _result_cache_key(code: str) -> str:
+    """
+    Get the key to cache the snekbox result of a runner under.
+
+    The runner includes the template, the unit code, and the user code, so identical
+    submissions to the same suite share a key for as long as the snekbox version doesn't change.
+    """
+    digest = hashlib.sha256(f"{constants.SNEKBOX_VERSION}\0{code}".encode()).hexdigest()
+    return f"forms-backend:unittest_result:{digest}"
+
+
 async def _post_eval(code: str) -> dict[str, str]:
     """Post the eval to snekbox and return the response."""
-    async with httpx.AsyncClient() as client:
-        data = {"input": code}
-        response = await client.post(SNEKBOX_URL, json=data, timeout=10)
+    data = {"input": code}
+    response = await get_client(Upstream.SNEKBOX).post(constants.SNEKBOX_URL, json=data)
 
-        response.raise_for_status()
-        return response.json()
+    response.raise_for_status()
+    return response.json()
 
 
-async def execute_unittest(
-    form_response: FormResponse,
-    form: Form,
-) -> tuple[list[UnittestResult], list[BypassDetectedError]]:
-    """Execute all the unittests in this form and return the results."""
-    unittest_results = []
-    errors = []
-
-    for index, question in enumerate(form.questions):
-        if question.type == "code":
-            # Exit early if the suite doesn't have any tests
-            if question.data["unittests"] is None:
-                unittest_results.append(
-                    UnittestResult(
-                        question_id=question.id,
-                        question_index=index,
-                        return_code=0,
-                        passed=True,
-                        result="",
-                    )
-                )
-                continue
+class _Harness(NamedTuple):
+    """The parts of a question's runner which don't depend on the submission."""
 
-            passed = False
+    # The runner code before and after the user code
+    prefix: str
+    suffix: str
+    # Maps censored test names to their number
+    hidden_tests: dict[str, int]
 
-            # Tests starting with an hashtag should have censored names.
-            hidden_test_counter = count(1)
-            hidden_tests = {
-                test.removeprefix("#").removeprefix("test_"): next(hidden_test_counter)
-                for test in question.data["unittests"]["tests"]
-                if test.startswith("#")
-            }
 
-            # Compose runner code
-            unit_code = _make_unit_code(question.data["unittests"]["tests"])
-            user_code = _make_user_code(form_response.response[question.id])
+def _build_harness(tests: dict[str, str]) -> _Harness:
+    # Tests starting with an hashtag should have censored names.
+    hidden_test_counter = count(1)
+    hidden_tests = {
+        test.removeprefix("#").removeprefix("test_"): next(hidden_test_counter)
+        for test in tests
+        if test.startswith("#")
+    }
 
-            code = TEST_TEMPLATE.replace("### USER CODE", user_code)
-            code = code.replace("### UNIT CODE", unit_code)
+    prefix, suffix = TEST_TEMPLATE.split("### USER CODE", 1)
+    suffix = suffix.replace("### UNIT CODE", _make_unit_code(tests))
+    return _Harness(prefix, suffix, hidden_tests)
 
-            try:
-                try:
+
+def _get_harness(form: Form, question: Question) -> _Harness:
+    """Get the harness of a code question, built once per version of the form."""
+    return form.memoize(
+        ("unittest_harness", question.id),
+        lambda: _build_harness(question.data["unittests"]["tests"]),
+    )
+
+
+def build_harnesses(form: Form) -> None:
+    """Build the harnesses of every code question ahead of the first submission."""
+    for question in form.questions:
+        if question.type == "code" and question.data["unittests"] is not None:
+            _get_harness(form, question)
+
+
+async def _run_suite(
+    form: Form,
+    index: int,
+    question: Question,
+    form_response: FormResponse,
+    priority: int,
+) -> tuple[UnittestResult, BypassDetectedError | None]:
+    """Run the unittests of a single code question."""
+    # Exit early if the suite doesn't have any tests
+    if question.data["unittests"] is None:
+        unittest_result = UnittestResult(
+            question_id=question.id,
+            question_index=index,
+            return_code=0,
+            passed=True,
+            result="",
+        )
+        return unittest_result, None
+
+    passed = False
+    error = None
+
+    # Compose runner code
+    harness = _get_harness(form, question)
+    hidden_tests = harness.hidden_tests
+    code = f"{harness.prefix}{_make_user_code(form_response.response[question.id])}{harness.suffix}"
+
+    cache_key = _result_cache_key(code)
+    cached = await constants.REDIS_CLIENT.get(cache_key)
+    metrics.increment("cache.unittests.hit" if cached else "cache.unittests.miss")
+
+    try:
+        try:
+            if cached:
+                response = json.loads(cached)
+            else:
+                async with _snekbox_slots.hold(priority):
                     response = await _post_eval(code)
-                except HTTPStatusError:
-                    return_code = 99
-                    result = "Unable to contact code runner."
+        # Raised if the runner is too busy to give the evaluation a slot
+        except (HTTPStatusError, TimeoutError):
+            return_code = 99
+            result = "Unable to contact code runner."
+        else:
+            return_code = int(response["returncode"])
+
+            # Parse the stdout if the tests ran successfully
+            if return_code == 0:
+                stdout = response["stdout"]
+                try:
+                    passed = bool(int(stdout[0]))
+                except ValueError:
+                    msg = "Detected a bypass when reading result code."
+                    raise BypassDetectedError(msg)
+
+                if passed and stdout.strip() != "1":
+                    # Most likely a bypass attempt
+                    # A 1 was written to stdout to indicate success,
+                    # followed by the actual output
+                    msg = "Detected improper value for stdout in unittest."
+                    raise BypassDetectedError(msg)
+
+                # If the test failed, we have to populate the result string.
+                if not passed:
+                    failed_tests = stdout[1:].strip().split(";")
+
+                    # Redact failed hidden tests
+                    for i, failed_test in enumerate(failed_tests.copy()):
+                        if failed_test in hidden_tests:
+                            failed_tests[i] = f"hidden_test_{hidden_tests[failed_test]}"
+
+                    result = ";".join(failed_tests)
                 else:
-                    return_code = int(response["returncode"])
-
-                    # Parse the stdout if the tests ran successfully
-                    if return_code == 0:
-                        stdout = response["stdout"]
-                        try:
-                            passed = bool(int(stdout[0]))
-                        except ValueError:
-                            msg = "Detected a bypass when reading result code."
-                            raise BypassDetectedError(msg)
-
-                        if passed and stdout.strip() != "1":
-                            # Most likely a bypass attempt
-                            # A 1 was written to stdout to indicate success,
-                            # followed by the actual output
-                            msg = "Detected improper value for stdout in unittest."
-                            raise BypassDetectedError(msg)
-
-                        # If the test failed, we have to populate the result string.
-                        if not passed:
-                            failed_tests = stdout[1:].strip().split(";")
-
-                            # Redact failed hidden tests
-                            for i, failed_test in enumerate(failed_tests.copy()):
-                                if failed_test in hidden_tests:
-                                    failed_tests[i] = f"hidden_test_{hidden_tests[failed_test]}"
-
-                            result = ";".join(failed_tests)
-                        else:
-                            result = ""
-                    elif return_code in {5, 6, 99}:
-                        result = response["stdout"]
-                    # Killed by NsJail
-                    elif return_code == 137:
-                        return_code = 7
-                        result = "Timed out or ran out of memory."
-                    # Another code has been returned by CPython because of another failure.
-                    else:
-                        return_code = 99
-                        result = "Internal error."
-            except BypassDetectedError as error:
-                return_code = 10
-                result = "Bypass attempt detected, aborting."
-                errors.append(error)
-                passed = False
-
-            unittest_results.append(
-                UnittestResult(
-                    question_id=question.id,
-                    question_index=index,
-                    return_code=return_code,
-                    passed=passed,
-                    result=result,
-                )
-            )
+                    result = ""
+            elif return_code in {5, 6, 99}:
+                result = response["stdout"]
+            # Killed by NsJail
+            elif return_code == 137:
+                return_code = 7
+                result = "Timed out or ran out of memory."
+            # Another code has been returned by CPython because of another failure.
+            else:
+                return_code = 99
+                result = "Internal error."
+    except BypassDetectedError as bypass:
+        return_code = 10
+        result = "Bypass attempt detected, aborting."
+        error = bypass
+        passed = False
+
+    # Bypasses are always sent to snekbox, so each attempt is reported. Errors are retried in
+    # case the runner was only briefly unavailable, and so are timeouts and running out of
+    # memory (137, reported as 7), which depend on how busy the runner was
+    if not cached and return_code not in {7, 10, 99}:
+        await constants.REDIS_CLIENT.set(
+            cache_key, json.dumps(response), ex=constants.UNITTEST_CACHE_TTL
+        )
+
+    unittest_result = UnittestResult(
+        question_id=question.id,
+        question_index=index,
+        return_code=return_code,
+        passed=passed,
+        result=result,
+    )
+    return unittest_result, error
+
+
+async def execute_unittest(
+    form_response: FormResponse,
+    form: Form,
+) -> tuple[list[UnittestResult], list[BypassDetectedError]]:
+    """
+    Execute all the unittests in this form and return the results.
+
+    The suites of all questions are run at once. Evaluations from different submissions
+    take turns, so a form with many code questions doesn't hold up other submitters.
+    """
+    ticket = await _snekbox_slots.ticket()
+    suites = []
+
+    # If a suite fails, the others are cancelled, releasing their snekbox slots
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for index, question in enumerate(form.questions):
+                if question.type == "code":
+                    priority = _snekbox_slots.priority(len(suites), ticket)
+                    suites.append(
+                        tg.create_task(_run_suite(form, index, question, form_response, priority))
+                    )
+    # Callers handle the first failure, as they did before the suites ran concurrently
+    except* Exception as group:  # noqa: BLE001
+        raise group.exceptions[0] from None
 
+    outcomes = [suite.result() for suite in suites]
+    unittest_results = [result for result, _ in outcomes]
+    errors = [error for _, error in outcomes if error is not None]
     return unittest_results, errors
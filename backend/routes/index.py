@@ -6,9 +6,9 @@ from pydantic import BaseModel
 from pydantic.fields import Field
 from spectree import Response
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
 from backend.constants import GIT_SHA
+from backend.responses import JSONResponse
 from backend.route import Route
 from backend.validation import api
 
@@ -0,0 +1,39 @@
+"""Process-local metrics of the worker handling the request."""
+
+import platform
+
+from pydantic import BaseModel
+from pydantic.fields import Field
+from spectree import Response
+from starlette.authentication import requires
+from starlette.requests import Request
+
+from backend import metrics
+from backend.responses import JSONResponse
+from backend.route import Route
+from backend.validation import api
+
+
+class MetricsResponse(BaseModel):
+    node: str = Field(description="The node that processed the request.")
+    counters: dict[str, int] = Field(description="Counters since the worker started.")
+
+
+class MetricsRoute(Route):
+    """
+    Return the metrics of the worker handling the request.
+
+    Each worker keeps its own counters, so repeated requests may return different nodes.
+    """
+
+    name = "metrics"
+    path = "/metrics"
+
+    @requires(["authenticated", "admin"])
+    @api.validate(resp=Response(HTTP_200=MetricsResponse), tags=["admin"])
+    async def get(self, request: Request) -> JSONResponse:  # noqa: ARG002 Request is required by @requires
+        """Return the metrics of the worker handling the request."""
+        return JSONResponse({
+            "node": platform.uname().node,
+            "counters": metrics.snapshot(),
+        })
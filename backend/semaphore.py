@@ -0,0 +1,159 @@
+"""A semaphore shared by all replicas through Redis, which serves waiters in priority order."""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import typing as t
+import uuid
+
+from backend import constants
+
+# Expire holders and waiters which haven't been seen for a while, as their replica may have died.
+# Times are taken from Redis, so all replicas agree on them.
+_ACQUIRE_SCRIPT = """
+local holders, queue, seen = KEYS[1], KEYS[2], KEYS[3]
+local token, priority, limit, lease, patience = ARGV[1], ARGV[2], tonumber(ARGV[3]), ARGV[4], ARGV[5]
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+redis.call("ZREMRANGEBYSCORE", holders, "-inf", now)
+local stale = redis.call("ZRANGEBYSCORE", seen, "-inf", now - patience)
+if #stale > 0 then
+    redis.call("ZREM", queue, unpack(stale))
+    redis.call("ZREM", seen, unpack(stale))
+end
+
+redis.call("ZADD", queue, "NX", priority, token)
+redis.call("ZADD", seen, now, token)
+
+if redis.call("ZRANK", queue, token) < limit - redis.call("ZCARD", holders) then
+    redis.call("ZREM", queue, token)
+    redis.call("ZREM", seen, token)
+    redis.call("ZADD", holders, now + lease, token)
+    return 1
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+redis.call("ZREM", KEYS[1], ARGV[1])
+redis.call("ZREM", KEYS[2], ARGV[1])
+redis.call("ZREM", KEYS[3], ARGV[1])
+"""
+
+_acquire = constants.REDIS_CLIENT.register_script(_ACQUIRE_SCRIPT)
+_release = constants.REDIS_CLIENT.register_script(_RELEASE_SCRIPT)
+
+# Waiters poll much more often than this, so any which haven't been seen for this long are gone
+_WAITER_EXPIRY = 5
+
+# Leaves room for sequence numbers which are unique for a long time below each priority
+_PRIORITY_SCALE = 2**40
+
+
+class _LocalQueue:
+    """An in-process semaphore which wakes waiters in priority order, rather than arrival order."""
+
+    def __init__(self, limit: int) -> None:
+        self.free = limit
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        # Slots are handed straight to waiters on release, so there are none while slots are free
+        if self.free > 0:
+            self.free -= 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if not waiter.cancelled():
+                # The slot was handed over just as the wait was cancelled
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            # Cancelled waiters are left in the queue, and skipped here
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.free += 1
+
+
+class FairSemaphore:
+    """
+    Limits how many holders may use a resource at once, both in this process and across replicas.
+
+    Waiters are served in order of their priority, and then in order of arrival. Use `ticket`
+    to get an arrival number, shared by replicas, and `priority` to combine it with a turn, so
+    that callers which need several slots at once take turns with each other.
+
+    Holders which don't release their slot, for example because their replica died, lose it
+    after `lease` seconds. Waiters which don't get a slot within `acquire_timeout` seconds
+    raise `TimeoutError`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        limit: int,
+        process_limit: int,
+        lease: float,
+        acquire_timeout: float,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.limit = limit
+        self.lease = lease
+        self.acquire_timeout = acquire_timeout
+        self.poll_interval = poll_interval
+        self._keys = [
+            f"forms-backend:semaphore:{name}:holders",
+            f"forms-backend:semaphore:{name}:queue",
+            f"forms-backend:semaphore:{name}:seen",
+        ]
+        self._ticket_key = f"forms-backend:semaphore:{name}:tickets"
+        self._local = _LocalQueue(process_limit)
+
+    async def ticket(self) -> int:
+        """Get the next arrival number."""
+        return await constants.REDIS_CLIENT.incr(self._ticket_key)
+
+    @staticmethod
+    def priority(turn: int, ticket: int) -> int:
+        """Order waiters by turn, and then by ticket."""
+        return turn * _PRIORITY_SCALE + ticket % _PRIORITY_SCALE
+
+    async def _try_acquire(self, token: str, priority: int) -> bool:
+        args = [token, priority, self.limit, self.lease, _WAITER_EXPIRY]
+        return bool(await _acquire(keys=self._keys, args=args, client=constants.REDIS_CLIENT))
+
+    @contextlib.asynccontextmanager
+    async def hold(self, priority: int) -> t.AsyncIterator[None]:
+        """
+        Wait for a slot and hold it for the duration of the context.
+
+        Raises `TimeoutError` if no slot is free within `acquire_timeout` seconds.
+        """
+        deadline = asyncio.get_running_loop().time() + self.acquire_timeout
+        async with asyncio.timeout_at(deadline):
+            await self._local.acquire(priority)
+        try:
+            token = uuid.uuid4().hex
+            try:
+                # Slots are released by other replicas too, so Redis has to be polled
+                async with asyncio.timeout_at(deadline):
+                    while not await self._try_acquire(token, priority):
+                        await asyncio.sleep(self.poll_interval)
+                yield
+            finally:
+                await _release(keys=self._keys, args=[token], client=constants.REDIS_CLIENT)
+        finally:
+            self._local.release()
@@ -0,0 +1,144 @@
+"""
+Per-question summaries of the responses to a form, aggregated by MongoDB.
+
+Summaries are cached in Redis until the responses or the form change. Rather than deleting the
+cached summary, every change bumps a generation counter which is part of the cache key, so a
+summary computed while a response was being submitted can never be served after it.
+"""
+
+import typing as t
+
+from pymongo.database import Database
+
+from backend import constants, metrics, responses
+from backend.models import Form, Question
+
+_PREFIX = "forms-backend:summary"
+
+# Question types whose answers are counted per option
+HISTOGRAM_TYPES = frozenset({"radio", "checkbox", "select", "range"})
+
+# Questions which don't take an answer
+_SKIPPED_TYPES = frozenset({"section"})
+
+
+def _generation_key(form_id: str) -> str:
+    return f"{_PREFIX}:generation:{form_id}"
+
+
+def _answer(question: Question) -> str:
+    return f"$response.{question.id}"
+
+
+def _totals_stage(question: Question) -> list[dict]:
+    """Count the answered and unanswered responses to a question."""
+    unanswered = {"$eq": [{"$ifNull": [_answer(question), None]}, None]}
+    return [
+        {
+            "$group": {
+                "_id": None,
+                "answers": {"$sum": {"$cond": [unanswered, 0, 1]}},
+                "nulls": {"$sum": {"$cond": [unanswered, 1, 0]}},
+            },
+        },
+    ]
+
+
+def _histogram_stage(question: Question) -> list[dict]:
+    """
+    Count how many responses chose each option of a question.
+
+    Answers which are lists count once for each item, and answers which are objects,
+    such as checkboxes, count once for each key with a truthy value.
+    """
+    answer = _answer(question)
+    return [
+        {"$match": {f"response.{question.id}": {"$ne": None}}},
+        {
+            "$project": {
+                "options": {
+                    "$cond": [
+                        {"$eq": [{"$type": answer}, "object"]},
+                        {
+                            "$map": {
+                                "input": {
+                                    "$filter": {
+                                        "input": {"$objectToArray": answer},
+                                        "cond": "$$this.v",
+                                    },
+                                },
+                                "in": "$$this.k",
+                            },
+                        },
+                        answer,
+                    ],
+                },
+            },
+        },
+        # Unwinding an answer which isn't a list counts it as a single option
+        {"$unwind": "$options"},
+        {"$group": {"_id": "$options", "count": {"$sum": 1}}},
+    ]
+
+
+def _questions(form: Form) -> list[Question]:
+    return [question for question in form.questions if question.type not in _SKIPPED_TYPES]
+
+
+def build_pipeline(form: Form) -> list[dict]:
+    """Build a pipeline which summarises every question of a form in a single pass."""
+    facets = {"responses": [{"$count": "count"}]}
+
+    for index, question in enumerate(_questions(form)):
+        # Facet names can't contain the dots and dollars question IDs may have
+        facets[f"totals_{index}"] = _totals_stage(question)
+        if question.type in HISTOGRAM_TYPES:
+            facets[f"histogram_{index}"] = _histogram_stage(question)
+
+    return [{"$match": {"form_id": form.id}}, {"$facet": facets}]
+
+
+def _summarise(form: Form, result: dict[str, list[dict]]) -> dict[str, t.Any]:
+    total = result["responses"][0]["count"] if result["responses"] else 0
+    questions = {}
+
+    for index, question in enumerate(_questions(form)):
+        totals = result[f"totals_{index}"]
+        summary = {
+            "type": question.type,
+            "answers": totals[0]["answers"] if totals else 0,
+            "nulls": totals[0]["nulls"] if totals else 0,
+        }
+
+        if question.type in HISTOGRAM_TYPES:
+            # Options nobody chose are listed too, in the order of the question
+            options = dict.fromkeys(map(str, question.data.get("options", [])), 0)
+            for bucket in result[f"histogram_{index}"]:
+                options[str(bucket["_id"])] = bucket["count"]
+            summary["options"] = options
+
+        questions[question.id] = summary
+
+    return {"form_id": form.id, "responses": total, "questions": questions}
+
+
+async def get_summary(db: Database, form: Form) -> bytes:
+    """Get the summary of a form's responses as JSON, from the cache if it's up to date."""
+    generation = await constants.REDIS_CLIENT.get(_generation_key(form.id)) or b"0"
+    cache_key = f"{_PREFIX}:{form.id}:{generation.decode()}"
+
+    if cached := await constants.REDIS_CLIENT.get(cache_key):
+        metrics.increment("cache.summaries.hit")
+        return cached
+
+    metrics.increment("cache.summaries.miss")
+    [result] = await db.responses.aggregate(build_pipeline(form)).to_list(None)
+    summary = responses.dumps(_summarise(form, result))
+
+    await constants.REDIS_CLIENT.set(cache_key, summary, ex=constants.SUMMARY_CACHE_TTL)
+    return summary
+
+
+async def invalidate(form_id: str) -> None:
+    """Mark the cached summary of a form as out of date, after its responses or questions change."""
+    await constants.REDIS_CLIENT.incr(_generation_key(form_id))
@@ -0,0 +1,169 @@
+"""
+Pairwise preference tallies for condorcet vote questions.
+
+Each vote question of a form has a tally document in the `condorcet_tallies` collection,
+counting for every ordered pair of candidates how many ballots ranked the first above the second.
+Tallies are updated as responses are submitted and deleted, so winners can be found without
+reading every response.
+
+A tally is rebuilt from the responses when it is missing, when the candidates of the question
+change, or when its response count no longer matches the form's, which also repairs any
+updates lost to races with a rebuild.
+"""
+
+import asyncio
+import collections
+import itertools
+import typing as t
+
+from condorcet import utils
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from backend.models import Form, FormResponse, Question
+
+COLLECTION = "condorcet_tallies"
+
+# Rebuilds read only the vote field, so responses can be read in large batches
+REBUILD_BATCH_SIZE = 1000
+
+
+class Tally(t.NamedTuple):
+    """The pairwise preferences of every ballot cast for a question."""
+
+    candidates: list[str]
+    ballots: int
+    # `wins[i][j]` is the number of ballots ranking candidate `i` above candidate `j`
+    wins: list[list[int]]
+
+    def winners(self, n: int) -> tuple[list[str], dict]:
+        """Get the top `n` winners and the rest of the result table, as `CondorcetEvaluator` would."""
+        results = [
+            {self.candidates[i]: self.wins[i][j], self.candidates[j]: self.wins[j][i]}
+            for i, j in itertools.combinations(range(len(self.candidates)), 2)
+        ]
+        return utils.get_n_winners_from_result_table(n, utils.tabulate_pairwise_results(results))
+
+
+def _tally_id(form_id: str, question_id: str) -> str:
+    return f"{form_id}/{question_id}"
+
+
+def _ranks(ballot: t.Any, candidates: list[str]) -> list[int] | None:
+    """
+    Get the rank given to each candidate on a ballot, or None if the question wasn't answered.
+
+    Candidates without a preference are ranked last.
+    """
+    if not isinstance(ballot, dict):
+        return None
+    return [ballot.get(candidate) or len(candidates) for candidate in candidates]
+
+
+def _preferences(ranks: list[int]) -> t.Iterator[tuple[int, int]]:
+    """Yield every ordered pair of candidate indexes where the first is ranked above the second."""
+    for i, j in itertools.permutations(range(len(ranks)), 2):
+        if ranks[i] < ranks[j]:
+            yield i, j
+
+
+def _vote_questions(form: Form) -> list[Question]:
+    return [question for question in form.questions if question.type == "vote"]
+
+
+async def _update(db: Database, form: Form, responses: list[FormResponse], sign: int) -> None:
+    updates = []
+
+    for question in _vote_questions(form):
+        candidates = question.data["options"]
+        increments = collections.Counter({"responses": sign * len(responses)})
+
+        for response in responses:
+            if (ranks := _ranks(response.response.get(question.id), candidates)) is not None:
+                increments["ballots"] += sign
+                for i, j in _preferences(ranks):
+                    increments[f"wins.{i}.{j}"] += sign
+
+        # Tallies which don't exist yet, or are for other candidates, are left to be rebuilt
+        updates.append(
+            UpdateOne(
+                {"_id": _tally_id(form.id, question.id), "candidates": candidates},
+                {"$inc": dict(increments)},
+            ),
+        )
+
+    if updates:
+        await db[COLLECTION].bulk_write(updates, ordered=False)
+
+
+async def record(db: Database, form: Form, response: FormResponse) -> None:
+    """Add a newly submitted response to the tallies of the form."""
+    await _update(db, form, [response], 1)
+
+
+async def retract(db: Database, form: Form, responses: list[FormResponse]) -> None:
+    """Remove deleted responses from the tallies of the form."""
+    await _update(db, form, responses, -1)
+
+
+async def _rebuild(db: Database, form: Form, question: Question) -> Tally:
+    """Tally every response to the question, reading only its vote field."""
+    candidates = question.data["options"]
+    wins = [[0] * len(candidates) for _ in candidates]
+    responses = ballots = 0
+
+    cursor = db.responses.find(
+        {"form_id": form.id},
+        {"_id": False, f"response.{question.id}": True},
+    ).batch_size(REBUILD_BATCH_SIZE)
+
+    async for response in cursor:
+        responses += 1
+        ranks = _ranks(response.get("response", {}).get(question.id), candidates)
+        if ranks is None:
+            continue
+
+        ballots += 1
+        for i, j in _preferences(ranks):
+            wins[i][j] += 1
+
+    await db[COLLECTION].replace_one(
+        {"_id": _tally_id(form.id, question.id)},
+        {
+            "form_id": form.id,
+            "candidates": candidates,
+            "responses": responses,
+            "ballots": ballots,
+            "wins": {
+                str(i): {str(j): count for j, count in enumerate(row) if count}
+                for i, row in enumerate(wins)
+            },
+        },
+        upsert=True,
+    )
+
+    return Tally(candidates, ballots, wins)
+
+
+async def get_tally(db: Database, form: Form, question: Question) -> Tally:
+    """Get the tally of a vote question, rebuilding it if it's missing or out of date."""
+    stored, responses = await asyncio.gather(
+        db[COLLECTION].find_one({"_id": _tally_id(form.id, question.id)}),
+        db.responses.count_documents({"form_id": form.id}),
+    )
+
+    candidates = question.data["options"]
+    if not stored or stored["candidates"] != candidates or stored["responses"] != responses:
+        return await _rebuild(db, form, question)
+
+    stored_wins = stored["wins"]
+    wins = [
+        [stored_wins.get(str(i), {}).get(str(j), 0) for j in range(len(candidates))]
+        for i in range(len(candidates))
+    ]
+    return Tally(candidates, stored["ballots"], wins)
+
+
+async def delete(db: Database, form_id: str) -> None:
+    """Delete the tallies of a form."""
+    await db[COLLECTION].delete_many({"form_id": form_id})
@@ -0,0 +1,174 @@
+"""
+Discord webhook messages announcing form submissions.
+
+Forms with a `batch_window` on their webhook collect submissions in Redis for that many seconds,
+and announce them together, up to `EMBEDS_PER_MESSAGE` at a time.
+"""
+
+import time
+
+from pymongo.database import Database
+
+from backend import constants, discord_ratelimit, forms, jobs
+from backend.jobs import JobKind
+from backend.message_template import MessageTemplate
+from backend.models import Form, FormResponse
+
+# Discord's limits on a single webhook message
+EMBEDS_PER_MESSAGE = 10
+MAX_CONTENT_LENGTH = 2000
+
+_BATCH_PREFIX = "forms-backend:webhook_batch"
+_PENDING_BATCHES_KEY = f"{_BATCH_PREFIX}:pending"  # Set of form IDs with queued responses
+
+
+def is_enabled(form: Form | None) -> bool:
+    """Check a form still announces submissions, which may have changed since one was queued."""
+    return bool(
+        form and form.webhook and constants.FormFeatures.WEBHOOK_ENABLED.value in form.features
+    )
+
+
+def _mention(response: FormResponse) -> str:
+    """Mention the submitter if the form collects their Discord details."""
+    return f"<@{response.user.id}>" if response.user else "A user"
+
+
+def _build_embed(form: Form, response: FormResponse) -> dict:
+    embed = {
+        "title": "New Form Response",
+        "description": f"{_mention(response)} submitted a response to `{form.name}`.",
+        "url": f"https://forms-api.pythondiscord.com/forms/{form.id}/responses/{response.id}",
+        "timestamp": response.timestamp,
+        "color": 7506394,
+    }
+
+    # Add author to embed
+    if user := response.user:
+        embed["author"] = {"name": f"{user.username}#{user.discriminator}"}
+
+        if user.avatar:
+            url = f"https://cdn.discordapp.com/avatars/{user.id}/{user.avatar}.png"
+            embed["author"]["icon_url"] = url
+
+    return embed
+
+
+def _build_content(form: Form, response: FormResponse) -> str:
+    """Fill in the variables of the webhook message, see SCHEMA.md."""
+    template = form.memoize(
+        "message_template",
+        lambda: MessageTemplate(form.webhook.message),
+    )
+    return template.render({
+        "user": _mention(response),
+        "response_id": response.id,
+        "form": form.name,
+        "form_id": form.id,
+        "time": str(response.timestamp),
+    })
+
+
+def build_submission_hook(form: Form, response: FormResponse) -> dict:
+    """Build the webhook message for a submission."""
+    return build_batch_hook(form, [response])
+
+
+def build_batch_hook(form: Form, responses: list[FormResponse]) -> dict:
+    """Build a webhook message announcing up to `EMBEDS_PER_MESSAGE` submissions."""
+    hook = {
+        "embeds": [_build_embed(form, response) for response in responses],
+        "allowed_mentions": {"parse": ["users", "roles"]},
+        "username": form.name or "Python Discord Forms",
+    }
+
+    if form.webhook.message:
+        # One line per submission, leaving out those which don't fit
+        content = ""
+        for response in responses:
+            line = _build_content(form, response)
+            if len(content) + len(line) + 1 > MAX_CONTENT_LENGTH:
+                break
+            content = f"{content}\n{line}" if content else line
+
+        hook["content"] = content
+
+    return hook
+
+
+async def _send(form: Form, hook: dict) -> None:
+    params = {}
+
+    if form.webhook.thread_id:
+        params["thread_id"] = form.webhook.thread_id
+
+    r = await discord_ratelimit.webhook_request("POST", form.webhook.url, json=hook, params=params)
+    r.raise_for_status()
+
+
+async def send_submission_webhook(form: Form, response: FormResponse) -> None:
+    """Post the webhook message for a submission."""
+    await _send(form, build_submission_hook(form, response))
+
+
+def _batch_key(form_id: str) -> str:
+    return f"{_BATCH_PREFIX}:{form_id}"
+
+
+async def add_to_batch(form: Form, response: FormResponse) -> None:
+    """
+    Queue a submission to be announced with the others in the current batch window of its form.
+
+    The first submission of each window enqueues the job which flushes the batch once the
+    window closes.
+    """
+    async with constants.REDIS_CLIENT.pipeline(transaction=True) as pipe:
+        pipe.rpush(_batch_key(form.id), response.id)
+        pipe.sadd(_PENDING_BATCHES_KEY, form.id)
+        await pipe.execute()
+
+    window = form.webhook.batch_window
+    window_start = int(time.time() // window * window)
+    await jobs.enqueue(
+        JobKind.FLUSH_WEBHOOK_BATCH,
+        f"{form.id}:{window_start}",
+        delay=window_start + window - time.time(),
+        form_id=form.id,
+    )
+
+
+async def flush_batch(db: Database, form_id: str) -> None:
+    """
+    Announce every queued submission of a form.
+
+    Submissions are taken from the queue `EMBEDS_PER_MESSAGE` at a time, and put back if their
+    message can't be sent. Those whose form or response has since been deleted, or whose
+    webhook has been turned off, are dropped.
+    """
+    key = _batch_key(form_id)
+    form = await forms.load_form(db, form_id)
+
+    if is_enabled(form):
+        while response_ids := await constants.REDIS_CLIENT.lpop(key, EMBEDS_PER_MESSAGE):
+            ids = [response_id.decode() for response_id in response_ids]
+            cursor = db.responses.find({"_id": {"$in": ids}})
+            found = {raw["_id"]: FormResponse(**raw) async for raw in cursor}
+            responses = [found[response_id] for response_id in ids if response_id in found]
+            if not responses:
+                continue
+
+            try:
+                await _send(form, build_batch_hook(form, responses))
+            except BaseException:
+                await constants.REDIS_CLIENT.lpush(key, *reversed(ids))
+                raise
+    else:
+        await constants.REDIS_CLIENT.delete(key)
+
+    await constants.REDIS_CLIENT.srem(_PENDING_BATCHES_KEY, form_id)
+
+
+async def flush_all_batches(db: Database) -> None:
+    """Announce the queued submissions of every form, such as when a worker shuts down."""
+    for form_id in await constants.REDIS_CLIENT.smembers(_PENDING_BATCHES_KEY):
+        await flush_batch(db, form_id.decode())
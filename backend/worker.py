@@ -0,0 +1,140 @@
+"""
+Runs jobs from the queue in `backend.jobs`.
+
+Start a worker with `python -m backend.worker`. Any number of workers can run at once.
+"""
+
+import asyncio
+import contextlib
+import logging
+import signal
+
+from pymongo.database import Database
+
+from backend import constants, database, discord, forms, http_clients, jobs, webhooks
+from backend.discord_ratelimit import RateLimitedError
+from backend.jobs import Job, JobKind
+from backend.models import FormResponse
+
+logger = logging.getLogger(__name__)
+
+
+@jobs.handler(JobKind.SUBMISSION_WEBHOOK)
+async def submission_webhook(db: Database, job: Job) -> None:
+    """Announce a submission through the webhook of its form."""
+    form = await forms.load_form(db, job.args["form_id"])
+    raw_response = await db.responses.find_one({"_id": job.args["response_id"]})
+
+    # The form or response may have been deleted, or the webhook turned off, since
+    if not webhooks.is_enabled(form) or not raw_response:
+        logger.info("Skipping %s, the form has no webhook or the response is gone", job.key)
+        return
+
+    response = FormResponse(**raw_response)
+
+    if form.webhook.batch_window:
+        await webhooks.add_to_batch(form, response)
+        return
+
+    try:
+        await webhooks.send_submission_webhook(form, response)
+    except RateLimitedError as e:
+        raise jobs.RetryLaterError(e.retry_after)
+
+
+@jobs.handler(JobKind.FLUSH_WEBHOOK_BATCH)
+async def flush_webhook_batch(db: Database, job: Job) -> None:
+    """Announce the submissions collected over a batch window of a form."""
+    try:
+        await webhooks.flush_batch(db, job.args["form_id"])
+    except RateLimitedError as e:
+        raise jobs.RetryLaterError(e.retry_after)
+
+
+@jobs.handler(JobKind.ASSIGN_ROLE)
+async def assign_role(db: Database, job: Job) -> None:
+    """Give the role of a form to a member who submitted it."""
+    form = await forms.load_form(db, job.args["form_id"])
+
+    if not form or not form.discord_role:
+        logger.info("Skipping %s, the form no longer assigns a role", job.key)
+        return
+
+    try:
+        await discord.assign_role(job.args["user_id"], form.discord_role)
+    except RateLimitedError as e:
+        raise jobs.RetryLaterError(e.retry_after)
+
+
+async def run_job(db: Database, job: Job) -> None:
+    """Run a claimed job, and record its outcome in the queue."""
+    try:
+        async with asyncio.timeout(constants.JOB_TIMEOUT):
+            await jobs.HANDLERS[job.kind](db, job)
+    except jobs.RetryLaterError as e:
+        await jobs.retry_later(job, e.delay)
+    except Exception as e:
+        logger.exception("Job %s failed on attempt %d", job.key, job.attempts + 1)
+        await jobs.fail(job, repr(e))
+    else:
+        await jobs.finish(job)
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    """Claim and run jobs until `stop` is set, then wait for running jobs to finish."""
+    client = database.create_client()
+    db = client[constants.MONGO_DATABASE]
+    http_clients.open_clients()
+
+    slots = asyncio.Semaphore(constants.JOB_WORKER_CONCURRENCY)
+    running: set[asyncio.Task] = set()
+
+    try:
+        while not stop.is_set():
+            await slots.acquire()
+            try:
+                job = await jobs.claim()
+            except Exception:
+                # Such as Redis being briefly unavailable, which shouldn't stop the worker
+                logger.exception("Failed to claim a job")
+                job = None
+
+            if job is None:
+                slots.release()
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(stop.wait(), constants.JOB_POLL_INTERVAL)
+                continue
+
+            task = asyncio.create_task(run_job(db, job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        await asyncio.gather(*running)
+
+        # Announce batched submissions now, rather than leaving them for the next worker
+        try:
+            await webhooks.flush_all_batches(db)
+        except Exception:
+            logger.exception("Failed to flush webhook batches on shutdown")
+    finally:
+        await http_clients.close_clients()
+        client.close()
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    # The image stops containers with SIGQUIT
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGQUIT):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("Job worker started")
+    await run_worker(stop)
+    logger.info("Job worker stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,10 @@
+"""
+Benchmarks of the backend's hot paths.
+
+Run them from the repository root with `poetry run python -m scripts.bench.<name>`.
+"""
+
+import os
+
+# The Redis client is created on import, but doesn't connect until it's used
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
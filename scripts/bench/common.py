@@ -0,0 +1,109 @@
+"""Timing and setup shared by the benchmarks."""
+
+import asyncio
+import statistics
+import time
+import timeit
+import typing as t
+
+import fakeredis
+import mongomock_motor
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.database import Database
+
+from backend import constants, database
+
+# Benchmarks which write to MongoDB use this database, and drop it when they finish
+DATABASE = "forms_bench"
+
+
+def use_fake_redis() -> None:
+    """Replace the Redis client with an in-memory one, for benchmarks that don't measure Redis."""
+    constants.REDIS_CLIENT = fakeredis.FakeAsyncRedis()
+
+
+def connect() -> tuple[AsyncIOMotorClient, Database]:
+    """
+    Connect to the MongoDB server at DATABASE_URL, or an in-memory stand-in if it isn't set.
+
+    The stand-in scans every document for most queries, so it only shows how the amount of
+    work changes, not the times of a real server.
+    """
+    if constants.DATABASE_URL:
+        client = database.create_client()
+    else:
+        client = mongomock_motor.AsyncMongoMockClient()
+    return client, client[DATABASE]
+
+
+def per_call(func: t.Callable[[], object]) -> float:
+    """Measure the time of a call in seconds, taking the best of several runs."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+async def per_call_async(func: t.Callable[[], t.Awaitable[object]], number: int = 1000) -> float:
+    """Measure the time of an awaited call in seconds, taking the best of several runs."""
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        runs.append((time.perf_counter() - start) / number)
+    return min(runs)
+
+
+class Load(t.NamedTuple):
+    """The outcome of running requests concurrently."""
+
+    requests: int
+    seconds: float
+    latencies: list[float]
+
+    @property
+    def per_second(self) -> float:
+        return self.requests / self.seconds
+
+    @property
+    def p99(self) -> float:
+        return statistics.quantiles(self.latencies, n=100)[98]
+
+
+async def load(
+    request: t.Callable[[], t.Awaitable[object]],
+    *,
+    requests: int,
+    concurrency: int,
+) -> Load:
+    """Run `requests` calls of `request`, `concurrency` at a time, timing each one."""
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(concurrency):
+            tg.create_task(client())
+
+    return Load(requests, time.perf_counter() - start, latencies)
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.1f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def report(label: str, seconds: float, baseline: float | None = None) -> None:
+    """Print the time of a call, and how many times faster it is than `baseline`."""
+    line = f"{label:<40} {format_time(seconds):>10}"
+    if baseline is not None:
+        line += f"  {baseline / seconds:>8.1f}x"
+    print(line)  # noqa: T201
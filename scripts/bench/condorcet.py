@@ -0,0 +1,100 @@
+"""
+Benchmark of finding the winners of a vote question with 50,000 ballots.
+
+Before tallies, every request loaded and validated every response of the form and ran
+`CondorcetEvaluator` over all of them. Now a stored tally is read, and rebuilt from the
+projected vote field only when it's out of date.
+
+Set DATABASE_URL to measure against a MongoDB server, otherwise an in-memory stand-in is used.
+"""
+
+import asyncio
+import random
+import time
+
+from condorcet import CondorcetEvaluator
+from pymongo.database import Database
+
+from backend import tallies
+from backend.models import Form, FormResponse
+from scripts.bench import common
+
+BALLOTS = 50_000
+CANDIDATES = [f"candidate_{i}" for i in range(8)]
+
+FORM = Form(
+    id="vote",
+    features=[],
+    questions=[
+        {
+            "id": "vote",
+            "name": "Vote",
+            "type": "vote",
+            "data": {"options": CANDIDATES},
+            "required": True,
+        },
+        {"id": "comment", "name": "Comment", "type": "textarea", "data": {}, "required": False},
+    ],
+    name="Vote",
+    description="A vote with many ballots.",
+)
+
+
+def make_response(index: int) -> dict:
+    ranks = random.sample(range(1, len(CANDIDATES) + 1), len(CANDIDATES))
+    ballot = dict(zip(CANDIDATES, ranks, strict=True))
+    # Some candidates are left without a preference
+    ballot[random.choice(CANDIDATES)] = None
+    return FormResponse(
+        id=f"response_{index}",
+        form_id=FORM.id,
+        response={"vote": ballot, "comment": "A comment which isn't needed to count votes."},
+        timestamp="2024-01-01T00:00:00",
+    ).dict(by_alias=True)
+
+
+async def old_winners(db: Database) -> list[str]:
+    """Find the winner as the route did before tallies."""
+    cursor = db.responses.find({"form_id": FORM.id})
+    responses = [FormResponse(**response) for response in await cursor.to_list(None)]
+    votes = [
+        {option: score or len(CANDIDATES) for option, score in response.response["vote"].items()}
+        for response in responses
+    ]
+    winners, _ = CondorcetEvaluator(candidates=CANDIDATES, votes=votes).get_n_winners(1)
+    return winners
+
+
+async def tally_winners(db: Database) -> list[str]:
+    winners, _ = (await tallies.get_tally(db, FORM, FORM.questions[0])).winners(1)
+    return winners
+
+
+async def timed(coro: object) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - start, result
+
+
+async def main() -> None:
+    client, db = common.connect()
+    responses = [make_response(index) for index in range(BALLOTS)]
+    for start in range(0, BALLOTS, 5000):
+        await db.responses.insert_many(responses[start : start + 5000])
+
+    old, old_result = await timed(old_winners(db))
+    rebuild, rebuild_result = await timed(tally_winners(db))
+    stored, stored_result = await timed(tally_winners(db))
+    assert old_result == rebuild_result == stored_result  # noqa: S101
+
+    print(f"Condorcet winner of {BALLOTS} ballots, {len(CANDIDATES)} candidates")  # noqa: T201
+    common.report("all responses evaluated per request", old)
+    common.report("tally rebuilt from the vote field", rebuild, old)
+    common.report("stored tally", stored, old)
+
+    await client.drop_database(common.DATABASE)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
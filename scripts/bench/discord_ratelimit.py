@@ -0,0 +1,65 @@
+"""
+Benchmark of assigning roles to 30 members at once, against a simulated Discord.
+
+Before the limiter, every request was sent straight away, and a 429 was raised for the job
+queue to retry once the bucket reset. Now requests wait in Redis for the bucket to reset, and
+are only sent when they fit in it. The simulated Discord allows 5 requests per second, and Redis
+is replaced by an in-memory stand-in.
+"""
+
+import asyncio
+import time
+import typing as t
+
+from backend import discord_ratelimit, http_clients
+from backend.http_clients import Upstream, get_client
+from scripts.bench import common
+from tests.fakes import FakeDiscord
+
+MEMBERS = 30
+ROUTE = "/guilds/{guild_id}/members/{user_id}/roles/{role_id}"
+
+
+def url(member: int) -> str:
+    return f"https://discord.com/api/v10/guilds/1/members/{member}/roles/1"
+
+
+async def old_assign_role(member: int) -> None:
+    """Send the request, and retry it after a 429 as the job queue did."""
+    while True:
+        response = await get_client(Upstream.DISCORD).put(url(member))
+        if response.status_code != 429:
+            return
+        await asyncio.sleep(float(response.headers["X-RateLimit-Reset-After"]))
+
+
+async def assign_role(member: int) -> None:
+    await discord_ratelimit.request("PUT", url(member), route=ROUTE, major="1", max_wait=60)
+
+
+async def measure(assign: t.Callable[[int], t.Awaitable[None]]) -> tuple[float, int]:
+    discord = FakeDiscord(limit=5, window=1)
+    http_clients.open_clients(discord.transport())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(assign(member) for member in range(MEMBERS)))
+    seconds = time.perf_counter() - start
+
+    await http_clients.close_clients()
+    return seconds, discord.rejected
+
+
+async def main() -> None:
+    common.use_fake_redis()
+
+    print(f"{MEMBERS} role assignments at once, 5 requests per second allowed")  # noqa: T201
+    for label, assign in (
+        ("sent at once, retried on 429", old_assign_role),
+        ("rate limiter", assign_role),
+    ):
+        seconds, rejected = await measure(assign)
+        print(f"{label:<40} {common.format_time(seconds):>10}  {rejected:>5} 429s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark of composing the snekbox runner of a code question with 150 tests.
+
+Before harnesses, every submission rebuilt the unit code and the map of hidden tests, and
+replaced both markers in the whole template. Now the harness is built once per version of the
+form, and only the user code is encoded and joined between its prefix and suffix.
+"""
+
+from itertools import count
+
+from backend.models import Form, FormResponse
+from backend.routes.forms import unittesting
+from scripts.bench import common
+
+TESTS = {
+    "setUp": "self.value = 1",
+    **{
+        f"{"#" if i % 3 == 0 else ""}test_{i}": f"self.assertEqual(self.value * {i}, {i})"
+        for i in range(150)
+    },
+}
+
+FORM = Form(
+    id="exercise",
+    features=[],
+    questions=[
+        {
+            "id": "exercise",
+            "name": "Exercise",
+            "type": "code",
+            "data": {"language": "python", "unittests": {"tests": TESTS}},
+            "required": True,
+        },
+    ],
+    name="Exercise",
+    description="A form with a large test suite.",
+)
+QUESTION = FORM.questions[0]
+
+RESPONSE = FormResponse(
+    id="response",
+    form_id=FORM.id,
+    response={QUESTION.id: "def multiply(a, b):\n    return a * b\n" * 20},
+    timestamp="2024-01-01T00:00:00",
+)
+
+
+def old_runner() -> tuple[str, dict[str, int]]:
+    """Compose the runner as `_run_suite` did before harnesses."""
+    hidden_test_counter = count(1)
+    hidden_tests = {
+        test.removeprefix("#").removeprefix("test_"): next(hidden_test_counter)
+        for test in QUESTION.data["unittests"]["tests"]
+        if test.startswith("#")
+    }
+
+    unit_code = unittesting._make_unit_code(QUESTION.data["unittests"]["tests"])  # noqa: SLF001
+    user_code = unittesting._make_user_code(RESPONSE.response[QUESTION.id])  # noqa: SLF001
+
+    code = unittesting.TEST_TEMPLATE.replace("### USER CODE", user_code)
+    code = code.replace("### UNIT CODE", unit_code)
+    return code, hidden_tests
+
+
+def runner() -> tuple[str, dict[str, int]]:
+    harness = unittesting._get_harness(FORM, QUESTION)  # noqa: SLF001
+    user_code = unittesting._make_user_code(RESPONSE.response[QUESTION.id])  # noqa: SLF001
+    return f"{harness.prefix}{user_code}{harness.suffix}", harness.hidden_tests
+
+
+def main() -> None:
+    assert old_runner() == runner()  # noqa: S101
+
+    print(f"Runner of a code question, {len(TESTS) - 1} tests")  # noqa: T201
+    old = common.per_call(old_runner)
+    common.report("runner composed per submission", old)
+    common.report("harness built once per form version", common.per_call(runner), old)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the body of a public read of a form with 200 questions.
+
+Before, every read built the public projection of the form with `Form.dict(admin=False)` and
+serialized it with the submission precheck. Now the projection is serialized once per revision
+of the form, and the precheck is spliced into the cached bytes.
+"""
+
+import json
+
+from backend import forms
+from backend.models import Form
+from backend.responses import add_fields, dumps
+from backend.routes.forms.form import SubmissionPrecheck
+from scripts.bench import common
+
+QUESTIONS = 200
+
+
+def make_question(index: int) -> dict:
+    question = {"id": f"question_{index}", "name": f"Question {index}", "required": index % 2 == 0}
+    match index % 4:
+        case 0:
+            return question | {
+                "type": "radio",
+                "data": {"options": [f"Option {i}" for i in range(5)]},
+            }
+        case 1:
+            return question | {"type": "section", "data": {"text": "Some context. " * 20}}
+        case 2:
+            return question | {"type": "textarea", "data": {"placeholder": "Your answer"}}
+        case _:
+            return question | {
+                "type": "code",
+                "data": {"language": "python", "unittests": {"tests": {"returns_one": "..."}}},
+            }
+
+
+FORM = Form(
+    id="large",
+    features=["DISCOVERABLE", "OPEN"],
+    questions=[make_question(index) for index in range(QUESTIONS)],
+    name="Large",
+    description="A form with many questions.",
+)
+
+
+def old_body(precheck: SubmissionPrecheck) -> bytes:
+    """Build the body as `SingleForm.get` did before public projections were cached."""
+    data = FORM.dict(admin=False)
+    data["submission_precheck"] = precheck.dict()
+    return dumps(data)
+
+
+def body(precheck: SubmissionPrecheck) -> bytes:
+    return add_fields(forms.public_json(FORM), {"submission_precheck": precheck.dict()})
+
+
+def main() -> None:
+    precheck = SubmissionPrecheck()
+    assert json.loads(old_body(precheck)) == json.loads(body(precheck))  # noqa: S101
+
+    print(f"Public form body, {QUESTIONS} questions")  # noqa: T201
+    old = common.per_call(lambda: old_body(precheck))
+    common.report("projection built per read", old)
+    common.report(
+        "projection serialized per revision", common.per_call(lambda: body(precheck)), old
+    )
+
+
+if __name__ == "__main__":
+    main()
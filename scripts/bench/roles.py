@@ -0,0 +1,92 @@
+"""
+Benchmark of looking up the role names of a member, in a guild with 1,000 roles.
+
+Before the role index, every authenticated request read the whole role hash from Redis, and
+built a `DiscordRole` model for each role. Redis is replaced by an in-memory stand-in, which
+leaves out the network time the old lookup also paid.
+"""
+
+import asyncio
+import json
+
+from backend import constants, discord, models
+from backend.authentication.user import User
+from scripts.bench import common
+
+ROLES = 1000
+MEMBER_ROLES = 20
+OLD_ROLE_CACHE_KEY = "forms-backend:role_cache"
+
+
+def make_roles() -> list[models.DiscordRole]:
+    return [
+        models.DiscordRole(
+            id=str(1000 + i),
+            name=f"Role {i}",
+            color=0,
+            hoist=False,
+            icon=None,
+            unicode_emoji=None,
+            position=i,
+            permissions="0",
+            managed=False,
+            mentionable=False,
+            tags=None,
+        )
+        for i in range(ROLES)
+    ]
+
+
+def make_member(roles: list[models.DiscordRole]) -> models.DiscordMember:
+    return models.DiscordMember(
+        user={"id": "1", "username": "member", "discriminator": "0", "avatar": None},
+        nick=None,
+        avatar=None,
+        roles=[role.id for role in roles[::50][:MEMBER_ROLES]],
+        joined_at="2020-01-01T00:00:00",
+        premium_since=None,
+        deaf=False,
+        mute=False,
+        pending=False,
+        permissions=None,
+        communication_disabled_until=None,
+    )
+
+
+async def old_get_user_roles(member: models.DiscordMember) -> list[str]:
+    """Look up role names as `User.get_user_roles` did, through the old `get_roles`."""
+    roles = [
+        models.DiscordRole(**json.loads(role_data))
+        for role_data in (await constants.REDIS_CLIENT.hgetall(OLD_ROLE_CACHE_KEY)).values()
+    ]
+    names = {role.id: role.name for role in roles}
+    return [names[role_id] for role_id in member.roles if role_id in names]
+
+
+async def main() -> None:
+    common.use_fake_redis()
+    roles = make_roles()
+    member = make_member(roles)
+
+    await constants.REDIS_CLIENT.hset(
+        OLD_ROLE_CACHE_KEY,
+        mapping={role.id: role.json() for role in roles},
+    )
+
+    async def get_role_info() -> list[models.DiscordRole]:  # noqa: RUF029
+        return roles
+
+    discord._get_role_info = get_role_info  # noqa: SLF001
+    await discord.get_roles(force_refresh=True)
+    user = User("token", {"id": "1"}, member)
+
+    assert await old_get_user_roles(member) == await user.get_user_roles()  # noqa: S101
+
+    print(f"get_user_roles, {ROLES} roles in the guild")  # noqa: T201
+    old = await common.per_call_async(lambda: old_get_user_roles(member), number=20)
+    common.report("role hash parsed per request", old)
+    common.report("role index", await common.per_call_async(user.get_user_roles), old)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Benchmark of serializing the responses to a form, as the responses route does, for 10,000 responses.
+
+Before, responses were rendered by Starlette's `JSONResponse`, with the standard library encoder.
+Now they are rendered with orjson, through `backend.responses.dumps`.
+"""
+
+import json
+import random
+
+from backend import responses
+from backend.models import FormResponse
+from scripts.bench import common
+
+RESPONSES = 10_000
+
+
+def make_response(index: int) -> dict:
+    return FormResponse(
+        id=f"response_{index}",
+        form_id="form",
+        user={
+            "id": str(index),
+            "username": f"user_{index}",
+            "discriminator": "0",
+            "avatar": None,
+            "admin": False,
+        },
+        antispam={"ip_hash": "a" * 32, "user_agent_hash": "b" * 32, "captcha_pass": True},
+        response={
+            "name": f"User {index}",
+            "age": random.randint(13, 90),
+            "languages": random.sample(["python", "rust", "go", "c", "zig"], 2),
+            "about": "Some text about myself, with unicode ✨ in it. " * 5,
+            "vote": {"first": 1, "second": 2, "third": None},
+        },
+        timestamp="2024-01-01T00:00:00",
+    ).dict()
+
+
+def old_dumps(content: object) -> bytes:
+    """Serialize as `starlette.responses.JSONResponse.render` does."""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def main() -> None:
+    content = [make_response(index) for index in range(RESPONSES)]
+    assert json.loads(old_dumps(content)) == json.loads(responses.dumps(content))  # noqa: S101
+
+    print(f"JSON body of {RESPONSES} form responses")  # noqa: T201
+    old = common.per_call(lambda: old_dumps(content))
+    common.report("standard library", old)
+    common.report("orjson", common.per_call(lambda: responses.dumps(content)), old)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of running the unittests of a submission to a form with five code questions.
+
+Before, the suite of each question was sent to snekbox once the previous one had answered.
+Now they all run at once, limited by the snekbox semaphore. Snekbox is replaced by a fake which
+answers each evaluation after a fixed delay, and Redis by an in-memory stand-in.
+"""
+
+import asyncio
+import time
+import typing as t
+import uuid
+
+from backend import constants, http_clients
+from backend.models import Form, FormResponse
+from backend.routes.forms import unittesting
+from scripts.bench import common
+from tests.fakes import FakeSnekbox
+
+QUESTIONS = 5
+# Roughly how long snekbox takes to run a small suite
+EVALUATION_TIME = 0.2
+SUBMISSIONS = 3
+
+FORM = Form(
+    id="exercises",
+    features=[],
+    questions=[
+        {
+            "id": f"exercise_{i}",
+            "name": f"Exercise {i}",
+            "type": "code",
+            "data": {"language": "python", "unittests": {"tests": {f"returns_{i}": "..."}}},
+            "required": True,
+        }
+        for i in range(QUESTIONS)
+    ],
+    name="Exercises",
+    description="A form with several code questions.",
+)
+
+
+def make_response() -> FormResponse:
+    # Unique code for every submission, so none are answered from the result cache
+    code = f"# {uuid.uuid4()}\ndef one(): return 1"
+    return FormResponse(
+        id="response",
+        form_id=FORM.id,
+        response={question.id: code for question in FORM.questions},
+        timestamp="2024-01-01T00:00:00",
+    )
+
+
+async def sequential(response: FormResponse) -> None:
+    """Run the suites as `execute_unittest` did before, one after another."""
+    for index, question in enumerate(FORM.questions):
+        await unittesting._run_suite(FORM, index, question, response, priority=0)  # noqa: SLF001
+
+
+async def concurrent(response: FormResponse) -> None:
+    await unittesting.execute_unittest(response, FORM)
+
+
+async def timed(runner: t.Callable[[FormResponse], t.Awaitable[None]]) -> float:
+    start = time.perf_counter()
+    for _ in range(SUBMISSIONS):
+        await runner(make_response())
+    return (time.perf_counter() - start) / SUBMISSIONS
+
+
+async def main() -> None:
+    common.use_fake_redis()
+    snekbox = FakeSnekbox(delay=EVALUATION_TIME)
+    http_clients.open_clients(snekbox.transport())
+
+    print(  # noqa: T201
+        f"execute_unittest, {QUESTIONS} code questions, {EVALUATION_TIME}s per evaluation, "
+        f"{constants.SNEKBOX_PROCESS_CONCURRENCY} slots per process"
+    )
+    old = await timed(sequential)
+    common.report("suites one after another", old)
+    common.report("suites at once", await timed(concurrent), old)
+
+    await http_clients.close_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import os
+import typing as t
+
+import fakeredis
+import jwt
+import mongomock_motor
+import pytest
+from starlette.testclient import TestClient
+
+# The Redis client is created on import, but doesn't connect until it's used
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+
+import backend
+from backend import constants, database, discord, forms
+
+ADMIN_ID = "1"
+
+
+@pytest.fixture
+def redis(monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeAsyncRedis:
+    """Replace the Redis client with an empty in-memory one."""
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(constants, "REDIS_CLIENT", client)
+    return client
+
+
+@pytest.fixture
+def db(monkeypatch: pytest.MonkeyPatch) -> mongomock_motor.AsyncMongoMockDatabase:
+    """Replace the MongoDB client with an empty in-memory one, and return its database."""
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(database, "create_client", lambda: client)
+    # Forms cached by earlier tests are gone from the new database
+    forms._cache.clear()  # noqa: SLF001
+    forms._public_cache.clear()  # noqa: SLF001
+    return client[constants.MONGO_DATABASE]
+
+
+@pytest.fixture
+def client(
+    redis: fakeredis.FakeAsyncRedis,  # noqa: ARG001
+    db: mongomock_motor.AsyncMongoMockDatabase,  # noqa: ARG001
+) -> t.Iterator[TestClient]:
+    """A client of the app, backed by in-memory databases."""
+    with TestClient(backend.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin(
+    client: TestClient,
+    db: mongomock_motor.AsyncMongoMockDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> TestClient:
+    """Log the client in as a forms admin who isn't a member of the guild."""
+
+    async def get_member(*_args, **_kwargs) -> None:  # noqa: RUF029
+        return None
+
+    monkeypatch.setattr(discord, "get_member", get_member)
+    client.portal.call(db.admins.insert_one, {"_id": ADMIN_ID})
+
+    token = jwt.encode(
+        {
+            "token": "access",
+            "refresh": "refresh",
+            "user_details": {"id": ADMIN_ID, "username": "admin", "discriminator": "0"},
+        },
+        constants.SECRET_KEY,
+        algorithm="HS256",
+    )
+    client.cookies.set("token", f"JWT {token}")
+    return client
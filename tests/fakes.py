@@ -0,0 +1,105 @@
+"""Stand-ins for the external services the backend talks to, served through `httpx.MockTransport`."""
+
+import asyncio
+import base64
+import json
+import re
+import time
+import typing as t
+
+import httpx
+
+_USER_CODE = re.compile(r'^USER_CODE = b"([^"]*)"$', re.MULTILINE)
+
+
+def passing(_code: str) -> dict[str, t.Any]:
+    """Answer every evaluation as if all its tests passed."""
+    return {"returncode": 0, "stdout": "1"}
+
+
+class FakeSnekbox:
+    """
+    Answers evaluations as snekbox would, after `delay` seconds, without running any code.
+
+    The user code of each runner is passed to `respond`, which returns the body of the answer.
+    Evaluations and the most which ran at once are counted.
+    """
+
+    def __init__(
+        self,
+        respond: t.Callable[[str], dict[str, t.Any]] = passing,
+        *,
+        delay: float = 0,
+    ) -> None:
+        self.respond = respond
+        self.delay = delay
+        self.evaluations = 0
+        self.running = 0
+        self.peak = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        match = _USER_CODE.search(json.loads(request.content)["input"])
+        if match is None:
+            return httpx.Response(400, json={"error": "No user code in the runner"})
+
+        self.evaluations += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+
+        code = base64.b64decode(match[1]).decode()
+        return httpx.Response(200, json=self.respond(code))
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+
+class FakeDiscord:
+    """
+    Answers requests as Discord would, with a bucket of `limit` requests per `window` seconds.
+
+    Like Discord, the bucket is shared by all routes but split by the major parameter, taken to
+    be the fourth segment of the path, such as the guild in `/api/v10/guilds/{guild_id}/...`.
+    Requests over the limit are rejected with a 429. Accepted and rejected requests are counted.
+    """
+
+    def __init__(self, *, limit: int = 3, window: float = 0.5) -> None:
+        self.limit = limit
+        self.window = window
+        self.accepted = 0
+        self.rejected = 0
+        self._windows: dict[str, tuple[float, int]] = {}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        major = request.url.path.split("/")[4]
+        now = time.monotonic()
+
+        start, used = self._windows.get(major, (now, 0))
+        if now - start >= self.window:
+            start, used = now, 0
+        reset_after = f"{self.window - (now - start):.3f}"
+
+        if used >= self.limit:
+            self.rejected += 1
+            headers = {
+                "X-RateLimit-Bucket": "bucket",
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset-After": reset_after,
+                "Retry-After": reset_after,
+            }
+            return httpx.Response(429, headers=headers, json={"retry_after": float(reset_after)})
+
+        self.accepted += 1
+        self._windows[major] = (start, used + 1)
+        headers = {
+            "X-RateLimit-Bucket": "bucket",
+            "X-RateLimit-Remaining": str(self.limit - used - 1),
+            "X-RateLimit-Reset-After": reset_after,
+        }
+        return httpx.Response(200, headers=headers, json={})
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+
+from backend.cache import TieredCache
+
+
+class Upstream:
+    """Counts the loads of a `TieredCache`, returning the current value of each key."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, list[str] | None] = {}
+        self.loads: list[str] = []
+
+    async def load(self, key: str) -> list[str] | None:
+        self.loads.append(key)
+        await asyncio.sleep(0.01)
+        return self.values.get(key)
+
+
+def make_cache(upstream: Upstream, **kwargs) -> TieredCache[list[str]]:
+    options = {"ttl": 60, "recheck_interval": 30, "local_maxsize": 10} | kwargs
+    return TieredCache(
+        "test",
+        loader=upstream.load,
+        dump=lambda value: json.dumps(value).encode(),
+        load=json.loads,
+        **options,
+    )
+
+
+@pytest.mark.usefixtures("redis")
+def test_concurrent_misses_load_once() -> None:
+    upstream = Upstream()
+    upstream.values["a"] = ["x"]
+    cache = make_cache(upstream)
+
+    async def main() -> None:
+        results = await asyncio.gather(*(cache.get("a") for _ in range(20)))
+        assert all(result == ["x"] for result in results)
+        assert upstream.loads == ["a"]
+
+    asyncio.run(main())
+
+
+@pytest.mark.usefixtures("redis")
+def test_workers_share_values() -> None:
+    upstream = Upstream()
+    upstream.values["a"] = ["x"]
+
+    async def main() -> None:
+        assert await make_cache(upstream).get("a") == ["x"]
+        assert await make_cache(upstream).get("a") == ["x"]
+        assert upstream.loads == ["a"]
+
+    asyncio.run(main())
+
+
+@pytest.mark.usefixtures("redis")
+def test_unchanged_value_is_kept() -> None:
+    upstream = Upstream()
+    upstream.values["a"] = ["x"]
+    cache = make_cache(upstream, recheck_interval=0)
+    other_worker = make_cache(upstream)
+
+    async def main() -> None:
+        first = await cache.get("a")
+        assert await cache.get("a") is first
+
+        # Reloading the same value doesn't replace it
+        await other_worker.get("a", force_refresh=True)
+        assert await cache.get("a") is first
+
+        upstream.values["a"] = ["y"]
+        await other_worker.get("a", force_refresh=True)
+        assert await cache.get("a") == ["y"]
+
+    asyncio.run(main())
+
+
+@pytest.mark.usefixtures("redis")
+def test_missing_values_are_not_cached() -> None:
+    upstream = Upstream()
+    cache = make_cache(upstream)
+
+    async def main() -> None:
+        assert await cache.get("missing") is None
+        assert await cache.get("missing") is None
+        assert upstream.loads == ["missing", "missing"]
+
+    asyncio.run(main())
+
+
+def test_entries_are_refreshed_before_expiry(redis: fakeredis.FakeAsyncRedis) -> None:
+    upstream = Upstream()
+    upstream.values["a"] = ["x"]
+
+    async def main() -> None:
+        await make_cache(upstream).get("a")
+        await redis.hset("forms-backend:test_cache:a", "expires", time.time() - 1)
+
+        # The cached value is served while it's refreshed in the background
+        assert await make_cache(upstream).get("a") == ["x"]
+        await asyncio.sleep(0.05)
+        assert upstream.loads == ["a", "a"]
+
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+import asyncio
+import typing as t
+
+import pytest
+
+from backend import discord_ratelimit, http_clients
+from tests.fakes import FakeDiscord
+
+ROUTE = "/guilds/{guild_id}/members/{user_id}"
+
+
+def run(discord: FakeDiscord, main: t.Callable[[], t.Awaitable[None]]) -> None:
+    async def wrapped() -> None:
+        http_clients.open_clients(discord.transport())
+        try:
+            await main()
+        finally:
+            await http_clients.close_clients()
+
+    asyncio.run(wrapped())
+
+
+async def get_member(user_id: int, *, max_wait: float = 10) -> int:
+    response = await discord_ratelimit.request(
+        "GET",
+        f"https://discord.com/api/v10/guilds/1/members/{user_id}",
+        route=ROUTE,
+        major="1",
+        max_wait=max_wait,
+    )
+    return response.status_code
+
+
+@pytest.mark.usefixtures("redis")
+def test_requests_wait_for_the_bucket() -> None:
+    discord = FakeDiscord(window=0.2)
+
+    async def main() -> None:
+        # The first response tells the limiter which bucket the route is in
+        await get_member(0)
+        statuses = await asyncio.gather(*(get_member(user_id) for user_id in range(1, 10)))
+        assert set(statuses) == {200}
+
+    run(discord, main)
+    assert discord.accepted == 10
+    # Only a request sent before the bucket was known can be rejected
+    assert discord.rejected <= 1
+
+
+@pytest.mark.usefixtures("redis")
+def test_long_waits_are_raised() -> None:
+    discord = FakeDiscord()
+
+    async def main() -> None:
+        for user_id in range(discord.limit):
+            await get_member(user_id)
+
+        with pytest.raises(discord_ratelimit.RateLimitedError) as error:
+            await get_member(discord.limit, max_wait=0.05)
+        assert 0 < error.value.retry_after <= discord.window
+
+    run(discord, main)
+    assert discord.rejected == 0
@@ -0,0 +1,75 @@
+import mongomock_motor
+from starlette.testclient import TestClient
+
+from backend.models import Form
+
+FORM = Form(
+    id="edited",
+    features=["DISCOVERABLE"],
+    questions=[],
+    name="Original",
+    description="The original description.",
+    discord_role=None,
+    response_readers=None,
+    editors=None,
+)
+
+
+def edit_elsewhere(client: TestClient, db: mongomock_motor.AsyncMongoMockDatabase) -> None:
+    """Update the form without going through this worker, as another replica would."""
+    client.portal.call(
+        db.forms.update_one,
+        {"_id": FORM.id},
+        {"$set": {"description": "Edited by another replica.", "revision": 1}},
+    )
+
+
+def test_patch_without_revision_applies_to_latest_form(
+    admin: TestClient,
+    db: mongomock_motor.AsyncMongoMockDatabase,
+) -> None:
+    admin.portal.call(db.forms.insert_one, FORM.dict(by_alias=True))
+    # Cache the form in this worker, before it's edited elsewhere
+    assert admin.get(f"/forms/{FORM.id}").json()["revision"] == 0
+    edit_elsewhere(admin, db)
+
+    response = admin.patch(f"/forms/{FORM.id}", json={"name": "Renamed"})
+    assert response.status_code == 200, response.text
+
+    stored = admin.portal.call(db.forms.find_one, {"_id": FORM.id})
+    assert stored["name"] == "Renamed"
+    assert stored["description"] == "Edited by another replica."
+    assert stored["revision"] == 2
+
+
+def test_patch_of_outdated_revision_conflicts(
+    admin: TestClient,
+    db: mongomock_motor.AsyncMongoMockDatabase,
+) -> None:
+    admin.portal.call(db.forms.insert_one, FORM.dict(by_alias=True))
+    edit_elsewhere(admin, db)
+
+    response = admin.patch(f"/forms/{FORM.id}", json={"name": "Renamed", "revision": 0})
+    assert response.status_code == 409, response.text
+    assert response.json() == {"error": "revision_conflict"}
+
+    stored = admin.portal.call(db.forms.find_one, {"_id": FORM.id})
+    assert stored["name"] == "Original"
+
+
+def test_recreated_form_is_not_served_from_cache(
+    client: TestClient,
+    db: mongomock_motor.AsyncMongoMockDatabase,
+) -> None:
+    original = FORM.copy(update={"instance": "original"})
+    client.portal.call(db.forms.insert_one, original.dict(by_alias=True))
+    [listed] = client.get("/forms/discoverable").json()
+    assert listed["description"] == original.description
+
+    # Deleted and created again by another replica, starting over from the same revision
+    recreated = original.copy(update={"instance": "recreated", "description": "Recreated."})
+    client.portal.call(db.forms.delete_one, {"_id": FORM.id})
+    client.portal.call(db.forms.insert_one, recreated.dict(by_alias=True))
+
+    [listed] = client.get("/forms/discoverable").json()
+    assert listed["description"] == "Recreated."
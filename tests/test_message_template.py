@@ -0,0 +1,48 @@
+import pytest
+
+from backend.message_template import MessageTemplate
+from backend.models import Form
+from backend.models.form import validate_hook_message
+
+STORED_FORM = {
+    "_id": "stored",
+    "features": ["OPEN"],
+    "questions": [],
+    "name": "Stored",
+    "description": "A form saved before webhook messages were checked.",
+    "webhook": {
+        "url": "https://discord.com/api/webhooks/1/token",
+        "message": "New entry {0} from {user} -- see {link}",
+    },
+    "discord_role": None,
+    "response_readers": None,
+    "editors": None,
+}
+
+
+def test_stored_form_with_unknown_variables_loads() -> None:
+    form = Form(**STORED_FORM)
+    assert form.webhook.message == STORED_FORM["webhook"]["message"]
+
+
+def test_unknown_variables_render_literally() -> None:
+    template = MessageTemplate(STORED_FORM["webhook"]["message"])
+    assert template.unknown == {"0", "link"}
+    assert template.render({"user": "<@1>"}) == "New entry {0} from <@1> -- see {link}"
+
+
+def test_legacy_user_mention_renders() -> None:
+    assert MessageTemplate("Hi _USER_MENTION_!").render({"user": "<@1>"}) == "Hi <@1>!"
+
+
+def test_unknown_variables_rejected_on_save() -> None:
+    validation = validate_hook_message(STORED_FORM["webhook"]["message"])
+    assert validation is not None
+    [error] = validation.errors()
+    assert error["loc"] == ("webhook", "message")
+    assert "{0}, {link}" in error["msg"]
+
+
+@pytest.mark.parametrize("message", [None, "{user} answered {form} at {time}"])
+def test_known_variables_accepted_on_save(message: str | None) -> None:
+    assert validate_hook_message(message) is None
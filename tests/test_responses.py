@@ -0,0 +1,46 @@
+import mongomock_motor
+import pytest
+from starlette.testclient import TestClient
+
+from backend.models import Form, FormResponse
+
+FORM = Form(
+    id="survey",
+    features=[],
+    questions=[
+        {"id": "name", "name": "Name", "type": "short_text", "data": {}, "required": True},
+        {"id": "about", "name": "About", "type": "textarea", "data": {}, "required": False},
+    ],
+    name="Survey",
+    description="A form with responses.",
+    discord_role=None,
+    response_readers=None,
+    editors=None,
+)
+
+RESPONSE = FormResponse(
+    id="response",
+    form_id=FORM.id,
+    response={"name": "Someone", "about": "Something"},
+    timestamp="2024-01-01T00:00:00",
+)
+
+
+@pytest.fixture
+def survey(admin: TestClient, db: mongomock_motor.AsyncMongoMockDatabase) -> TestClient:
+    admin.portal.call(db.forms.insert_one, FORM.dict(by_alias=True))
+    admin.portal.call(db.responses.insert_one, RESPONSE.dict(by_alias=True))
+    return admin
+
+
+def test_selected_questions_are_projected(survey: TestClient) -> None:
+    response = survey.get(f"/forms/{FORM.id}/responses", params={"questions": "name"})
+    assert response.status_code == 200, response.text
+    assert [item["response"] for item in response.json()] == [{"name": "Someone"}]
+
+
+@pytest.mark.parametrize("questions", ["", ","])
+def test_empty_selection_selects_every_question(survey: TestClient, questions: str) -> None:
+    response = survey.get(f"/forms/{FORM.id}/responses", params={"questions": questions})
+    assert response.status_code == 200, response.text
+    assert [item["response"] for item in response.json()] == [RESPONSE.response]
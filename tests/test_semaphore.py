@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from backend.semaphore import FairSemaphore
+
+
+@pytest.mark.usefixtures("redis")
+def test_waiters_give_up_after_the_timeout() -> None:
+    semaphore = FairSemaphore("test", limit=1, process_limit=1, lease=60, acquire_timeout=0.1)
+
+    async def main() -> None:
+        async with semaphore.hold(0):
+            with pytest.raises(TimeoutError):
+                async with semaphore.hold(1):
+                    pass
+
+        # The slot of the waiter which gave up is free again
+        async with semaphore.hold(2):
+            pass
+
+    asyncio.run(main())
+
+
+@pytest.mark.usefixtures("redis")
+def test_waiters_give_up_while_the_shared_limit_is_reached() -> None:
+    semaphore = FairSemaphore("test", limit=1, process_limit=2, lease=60, acquire_timeout=0.1)
+
+    async def main() -> None:
+        async with semaphore.hold(0):
+            with pytest.raises(TimeoutError):
+                async with semaphore.hold(1):
+                    pass
+
+        async with semaphore.hold(2):
+            pass
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import mongomock_motor
+import pytest
+from starlette.testclient import TestClient
+
+from backend import captcha
+from backend.models import Form
+
+FORM = Form(
+    id="survey",
+    features=["DISCOVERABLE", "OPEN"],
+    questions=[
+        {"id": "name", "name": "Name", "type": "short_text", "data": {}, "required": True},
+    ],
+    name="Survey",
+    description="A form with a captcha.",
+    discord_role=None,
+    response_readers=None,
+    editors=None,
+)
+
+
+def test_captcha_is_verified_once_across_retries(
+    client: TestClient,
+    db: mongomock_motor.AsyncMongoMockDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    verified = []
+
+    async def siteverify(token: str | None) -> bool:
+        verified.append(token)
+        # Slower than the other checks, so they fail while hCaptcha is still answering
+        await asyncio.sleep(0.05)
+        return True
+
+    monkeypatch.setattr(captcha, "_siteverify", siteverify)
+    client.portal.call(db.forms.insert_one, FORM.dict(by_alias=True))
+
+    response = client.post(f"/forms/submit/{FORM.id}", json={"response": {}, "captcha": "token"})
+    assert response.status_code == 400, response.text
+    assert response.json()["error"] == "missing_fields"
+
+    # The verification outlives the rejected submission
+    client.portal.call(asyncio.sleep, 0.1)
+
+    response = client.post(
+        f"/forms/submit/{FORM.id}",
+        json={"response": {"name": "Someone"}, "captcha": "token"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["response"]["antispam"]["captcha_pass"] is True
+    assert verified == ["token"]
+
+
+def test_check_errors_are_not_wrapped(
+    client: TestClient,
+    db: mongomock_motor.AsyncMongoMockDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def verify(_token: str | None) -> bool:  # noqa: RUF029
+        msg = "hCaptcha is unavailable"
+        raise httpx.ConnectError(msg)
+
+    monkeypatch.setattr(captcha, "verify", verify)
+    client.portal.call(db.forms.insert_one, FORM.dict(by_alias=True))
+
+    with pytest.raises(httpx.ConnectError):
+        client.post(
+            f"/forms/submit/{FORM.id}",
+            json={"response": {"name": "Someone"}, "captcha": "token"},
+        )
@@ -0,0 +1,83 @@
+import asyncio
+import typing as t
+
+import pytest
+
+from backend import http_clients
+from backend.models import Form, FormResponse
+from backend.routes.forms import unittesting
+from tests.fakes import FakeSnekbox
+
+QUESTIONS = 3
+
+FORM = Form(
+    id="exercises",
+    features=[],
+    questions=[
+        {
+            "id": f"exercise_{i}",
+            "name": f"Exercise {i}",
+            "type": "code",
+            "data": {
+                "language": "python",
+                "unittests": {"tests": {"returns_one": "...", "#hidden": "..."}},
+            },
+            "required": True,
+        }
+        for i in range(QUESTIONS)
+    ],
+    name="Exercises",
+    description="A form with several code questions.",
+)
+
+
+def make_response(code: str) -> FormResponse:
+    return FormResponse(
+        id="response",
+        form_id=FORM.id,
+        response={question.id: code for question in FORM.questions},
+        timestamp="2024-01-01T00:00:00",
+    )
+
+
+def run(snekbox: FakeSnekbox, response: FormResponse) -> t.Any:
+    async def main() -> t.Any:
+        http_clients.open_clients(snekbox.transport())
+        try:
+            return await unittesting.execute_unittest(response, FORM)
+        finally:
+            await http_clients.close_clients()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.usefixtures("redis")
+def test_suites_run_concurrently() -> None:
+    snekbox = FakeSnekbox(delay=0.05)
+    results, errors = run(snekbox, make_response("def one(): return 1"))
+
+    assert errors == []
+    assert [result.passed for result in results] == [True] * QUESTIONS
+    assert snekbox.peak == QUESTIONS
+
+    # The same code is answered from the result cache
+    run(snekbox, make_response("def one(): return 1"))
+    assert snekbox.evaluations == QUESTIONS
+
+
+@pytest.mark.usefixtures("redis")
+def test_hidden_failures_are_redacted() -> None:
+    snekbox = FakeSnekbox(lambda _: {"returncode": 0, "stdout": "0returns_one;hidden"})
+    results, _ = run(snekbox, make_response("def one(): return 2"))
+
+    assert {result.result for result in results} == {"returns_one;hidden_test_1"}
+    assert not any(result.passed for result in results)
+
+
+@pytest.mark.usefixtures("redis")
+def test_bypasses_are_reported() -> None:
+    snekbox = FakeSnekbox(lambda _: {"returncode": 0, "stdout": "1 and more"})
+    results, errors = run(snekbox, make_response("print(1)"))
+
+    assert len(errors) == QUESTIONS
+    assert {result.return_code for result in results} == {10}
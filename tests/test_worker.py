@@ -0,0 +1,78 @@
+import asyncio
+
+import mongomock_motor
+import pytest
+
+from backend import constants, jobs, webhooks, worker
+from backend.jobs import Job, JobKind
+from backend.models import Form, FormResponse
+
+FORM = Form(
+    id="announced",
+    features=[],
+    questions=[],
+    name="Announced",
+    description="A form whose webhook was turned off after a submission.",
+    webhook={"url": "https://discord.com/api/webhooks/1/token", "message": None},
+    discord_role=None,
+    response_readers=None,
+    editors=None,
+)
+
+RESPONSE = FormResponse(
+    id="response",
+    form_id=FORM.id,
+    response={},
+    timestamp="2024-01-01T00:00:00",
+)
+
+
+@pytest.mark.usefixtures("redis")
+def test_disabled_webhook_is_skipped(
+    db: mongomock_motor.AsyncMongoMockDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sent = []
+
+    async def send_submission_webhook(form: Form, response: FormResponse) -> None:  # noqa: RUF029
+        sent.append((form, response))
+
+    monkeypatch.setattr(webhooks, "send_submission_webhook", send_submission_webhook)
+    job = Job(
+        key="webhook",
+        kind=JobKind.SUBMISSION_WEBHOOK,
+        args={"form_id": FORM.id, "response_id": RESPONSE.id},
+    )
+
+    async def main() -> None:
+        await db.forms.insert_one(FORM.dict(by_alias=True))
+        await db.responses.insert_one(RESPONSE.dict(by_alias=True))
+        await worker.submission_webhook(db, job)
+
+    asyncio.run(main())
+    assert sent == []
+
+
+@pytest.mark.usefixtures("redis", "db")
+def test_worker_survives_claim_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    stop = asyncio.Event()
+    claims = 0
+
+    async def claim() -> Job | None:  # noqa: RUF029
+        nonlocal claims
+        claims += 1
+        if claims == 1:
+            msg = "Redis is unavailable"
+            raise ConnectionError(msg)
+
+        stop.set()
+        return None
+
+    monkeypatch.setattr(jobs, "claim", claim)
+    monkeypatch.setattr(constants, "JOB_POLL_INTERVAL", 0.01)
+
+    async def main() -> None:
+        await asyncio.wait_for(worker.run_worker(stop), timeout=1)
+
+    asyncio.run(main())
+    assert claims == 2